@@ -7,15 +7,30 @@ from src.game_ext import GameExt
 from src.map import Map
 from multiprocessing import Pool
 import importlib.util
+import ast
 import argparse
 import json
 import sys
-import copy
 import os
 import itertools
+import glob
+import hashlib
 import numpy as np
 from tabulate import tabulate
 
+# Engine sources and modules bots import are found relative to this file, not the working directory
+ROOT = os.path.dirname(os.path.abspath(__file__))
+# Finished games are stored here, keyed by everything that can change their result
+CACHE_DIR = "arena_cache"
+
+# Maps loaded by this process, by path. Maps are immutable, so every game played here shares them.
+loaded_maps = {}
+
+def load_map(map_path: str) -> Map:
+    if map_path not in loaded_maps:
+        loaded_maps[map_path] = Map(map_path)
+    return loaded_maps[map_path]
+
 def import_file(module_name, file_path):
     spec = importlib.util.spec_from_file_location(module_name, file_path)
     module = importlib.util.module_from_spec(spec)
@@ -25,12 +40,97 @@ def import_file(module_name, file_path):
 
 def make_player(fpath: str, map_inst: Map) -> (str, Player):
     player_name = os.path.basename(fpath).split(".")[0]
-    return import_file(player_name, fpath).BotPlayer(copy.deepcopy(map_inst))
+    return import_file(player_name, fpath).BotPlayer(map_inst)
 
 def get_player_name_and_path(fstr):
     return (os.path.basename(fstr).split(".")[0], fstr)
 
-def arena_builder(player_paths):
+def file_hash(fpath: str) -> str:
+    with open(fpath, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+def engine_version() -> str:
+    # Any change to the engine source invalidates every cached result
+    h = hashlib.sha256()
+    for fpath in sorted(glob.glob(os.path.join(ROOT, "src", "*.py"))):
+        h.update(file_hash(fpath).encode())
+    return h.hexdigest()
+
+def local_imports(fpath: str) -> list[str]:
+    '''
+    Returns the files of the modules fpath imports that are found in this repository or next to fpath
+    '''
+    try:
+        with open(fpath, 'rb') as f:
+            tree = ast.parse(f.read(), fpath)
+    except SyntaxError:
+        return []
+    # (directory to resolve from, module name) for every module that may be imported
+    modules = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            modules += [(None, alias.name) for alias in node.names]
+        elif isinstance(node, ast.ImportFrom):
+            base = None
+            if node.level > 0:
+                base = os.path.dirname(fpath)
+                for i in range(node.level - 1):
+                    base = os.path.dirname(base)
+            prefix = f"{node.module}." if node.module else ""
+            if node.module:
+                modules.append((base, node.module))
+            # from bots import helper imports a module, not a name
+            modules += [(base, prefix + alias.name) for alias in node.names]
+
+    files = []
+    for (base, module) in modules:
+        name = module.replace(".", os.sep)
+        for directory in ([base] if base else [ROOT, os.path.dirname(fpath)]):
+            for candidate in [name + ".py", os.path.join(name, "__init__.py")]:
+                path = os.path.join(directory, candidate)
+                if os.path.isfile(path):
+                    files.append(os.path.normpath(path))
+    return files
+
+def bot_hash(fpath: str) -> str:
+    # Hashes the bot and every local module it imports, directly or through other local modules (e.g. bots/helper.py).
+    # The engine is left out, engine_version already covers it.
+    engine_dir = os.path.join(ROOT, "src") + os.sep
+    seen = set()
+    pending = [os.path.normpath(os.path.abspath(fpath))]
+    while pending:
+        path = pending.pop()
+        if path not in seen and not path.startswith(engine_dir):
+            seen.add(path)
+            pending += local_imports(path)
+    h = hashlib.sha256()
+    for path in sorted(seen):
+        h.update(f"{os.path.relpath(path, ROOT)}:{file_hash(path)}".encode())
+    return h.hexdigest()
+
+def cache_key(p1_path: str, p2_path: str, map_path: str, engine: str, seed: int) -> str:
+    parts = [bot_hash(p1_path), bot_hash(p2_path), file_hash(map_path), engine, str(seed)]
+    return hashlib.sha256("-".join(parts).encode()).hexdigest()
+
+def load_cached_result(key: str):
+    try:
+        with open(os.path.join(CACHE_DIR, f"{key}.json")) as f:
+            result = json.load(f)
+    except (OSError, ValueError):
+        return None
+    result["winner"] = Team[result["winner"]]
+    return result
+
+def save_cached_result(key: str, result: dict):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = os.path.join(CACHE_DIR, f"{key}.json")
+    # Write then rename, so a concurrent or interrupted run never sees a partial file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(dict(result, winner=result["winner"].name), f)
+    os.replace(tmp_path, path)
+
+def arena_builder(player_paths, seed=0, use_cache=True):
     map_paths: list[str] = ["maps/three_disjoint_paths.awap24m"]
     map_paths += ["maps/spiral.awap24m"]
     map_paths += ["maps/line.awap24m"]
@@ -40,33 +140,62 @@ def arena_builder(player_paths):
     map_paths += [ "maps/biki_bott.awap24m" ]
     map_paths += [ "maps/simple_map1.awap24m" ]
 
-    maps = [Map(mpath)for mpath in map_paths]
+    # Games only carry the map's path, each worker loads a map once for all of its games
+    maps = [(mpath, load_map(mpath).name) for mpath in map_paths]
     player_combinations = [
-        (get_player_name_and_path(ppath1), get_player_name_and_path(ppath2), map_inst) for ((ppath1, ppath2), map_inst) in itertools.product(itertools.combinations_with_replacement(player_paths, 2), maps) ]
+        (get_player_name_and_path(ppath1), get_player_name_and_path(ppath2), map_path, map_name, seed) for ((ppath1, ppath2), (map_path, map_name)) in itertools.product(itertools.combinations_with_replacement(player_paths, 2), maps) ]
 
     working_opps = [] #["defense_farmer", "cane_farmer", "balthazar_farmer", "defense_bot", "dingo_farmer"]
     filtered_player_combos = list(filter(lambda e: True, enumerate(player_combinations)))
     filtered_opponents_that_work = list(filter(lambda x: True, filtered_player_combos))
     no_against_self = list(filter(lambda x: x[1][0][0] != x[1][1][0], filtered_opponents_that_work))
     print(len(no_against_self))
+
+    # Serve unchanged matchups from the cache and only simulate the rest
+    engine = engine_version()
+    results = [None] * len(no_against_self)
+    to_run = []
+    for (j, (i, ((p1_name, p1_path), (p2_name, p2_path), map_path, map_name, seed))) in enumerate(no_against_self):
+        key = cache_key(p1_path, p2_path, map_path, engine, seed)
+        cached = load_cached_result(key) if use_cache else None
+        if cached is not None:
+            print_result(cached["player1"], cached["player2"], map_name, cached["winner"], cached["turns"])
+            results[j] = cached
+        else:
+            to_run.append((j, key, no_against_self[j]))
+    print(f"{len(no_against_self) - len(to_run)} cached, {len(to_run)} to run")
+
     with Pool(12) as p:
-        return p.map(execute_game_and_output, no_against_self)
+        for ((j, key, _), result) in zip(to_run, p.map(execute_game_and_output, [combo for (_, _, combo) in to_run])):
+            if use_cache:
+                save_cached_result(key, result)
+            results[j] = result
+    return results
+
 
+def print_result(p1_name, p2_name, map_name, winner, turns):
+    row = [p1_name, p2_name, map_name, winner, turns]
+    print('| {:^20} | {:^20} | {:^20} | {:10} | {:<5} |'.format(*row)) 
 
 def execute_game_and_output(player_combination):
-    (i, ((p1_name, p1_path), (p2_name, p2_path), map_inst)) = player_combination
+    (i, ((p1_name, p1_path), (p2_name, p2_path), map_path, map_name, seed)) = player_combination
+    map_inst = load_map(map_path)
     p1 = make_player(p1_path, map_inst)
     p2 = make_player(p2_path, map_inst)
-    game = GameExt(p1_name, p1, p2_name, p2, map_inst)
+    game = GameExt(p1_name, p1, p2_name, p2, map_inst, seed=seed)
 
     winner = game.run_game()
-    row = [p1_name, p2_name, game.map.name, winner, game.gs.turn]
-    print('| {:^20} | {:^20} | {:^20} | {:10} | {:<5} |'.format(*row)) 
+    print_result(p1_name, p2_name, game.map.name, winner, game.gs.turn)
     return {"player1": p1_name, "player2": p2_name, "winner": winner, "turns": game.gs.turn }
 
 def main():
+    parser = argparse.ArgumentParser(description="Play every pair of bots against each other on every map")
+    parser.add_argument("--seed", type=int, default=0, help="Seed used to break exact ties")
+    parser.add_argument("--no-cache", action="store_true", help=f"Re-run every game instead of reusing results from {CACHE_DIR}/")
+    args = parser.parse_args()
+
     player_paths = ["bots/azazel.py", "bots/azazel_farmer.py", "bots/balthazar_farmer.py", "bots/defense_bot.py", "bots/defense_bomb.py", "bots/dingo_farmer_fixhp.py", "bots/defense_farmer.py", "bots/dingo_defender.py", "bots/exodius_overload.py", "bots/exodius_horizon.py", "bots/exodius_fortress.py"]
-    results = arena_builder(player_paths)
+    results = arena_builder(player_paths, seed=args.seed, use_cache=not args.no_cache)
 
     player_names = [os.path.basename(p_path).split(".")[0] for p_path in player_paths]
 
@@ -0,0 +1,125 @@
+'''
+Cost of one bomber attack on clusters of 60 or more debris, damaging the debris store in a single
+array operation compared with the original engine, which kept each team's debris in a dict of
+Debris objects and damaged them one at a time.
+"survive" clusters take the hit, "die" clusters are all removed by it.
+
+Run from the repository root:
+python -m benchmarks.bomb
+'''
+import time
+import numpy as np
+
+from src.game_constants import Team, TowerType
+from src.game_state import GameState
+from src.map import Map
+from src.robot_controller import RobotController
+
+CLUSTER_SIZES = [60, 120, 240, 480]
+CALLS = 200
+
+def build_state(map: Map, cluster_size: int, health: int) -> tuple:
+    '''
+    Returns a GameState with a bomber next to the middle of the path and cluster_size debris on
+    the path tiles it covers, along with the bomber's id
+    '''
+    gs = GameState(map)
+    middle = map.path_length // 2
+    x, y = int(map.path_x[middle]), int(map.path_y[middle])
+    for (dx, dy) in [(0, 1), (0, -1), (1, 0), (-1, 0)]:
+        if gs.is_placeable(Team.BLUE, x + dx, y + dy):
+            bomber = gs.build_tower(Team.BLUE, TowerType.BOMBER, x + dx, y + dy)
+            break
+    covered = map.path_indices_in_range(bomber.x, bomber.y, TowerType.BOMBER.range)
+    store = gs.debris[Team.BLUE]
+    for i in range(cluster_size):
+        row = store.row_of(store.spawn(1, health, False))
+        store.progress[row] = covered[i % len(covered)]
+        store.x[row] = map.path_x[store.progress[row]]
+        store.y[row] = map.path_y[store.progress[row]]
+    return gs, bomber.id
+
+class BaselineDebris:
+    '''
+    The fields of the original mutable Debris that bombing reads or writes
+    '''
+    def __init__(self, id: int, x: int, y: int, health: int):
+        self.id = id
+        self.x = x
+        self.y = y
+        self.health = health
+
+def baseline_debris(gs: GameState) -> dict:
+    '''
+    Returns each team's debris as the original engine stored them, {id: Debris} in id order
+    '''
+    debris = {}
+    for team in Team:
+        store = gs.debris[team]
+        debris[team] = {
+            id: BaselineDebris(id, x, y, health)
+            for (id, x, y, health) in zip(store.id.tolist(), store.x.tolist(), store.y.tolist(), store.health.tolist())
+        }
+    return debris
+
+def bomb_per_debris(gs: GameState, debris: dict, tower_id: int):
+    # RobotController.bomb and GameState.damage_debris as they were before the debris store
+    tower = gs.towers[Team.BLUE][tower_id]
+    tower.current_cooldown = TowerType.BOMBER.cooldown
+    gs.current_bombs[Team.BLUE].append((tower.x, tower.y))
+    ids_in_range = []
+    for deb in debris[Team.BLUE].values():
+        distance = (tower.x - deb.x)**2 + (tower.y - deb.y)**2
+        if distance <= TowerType.BOMBER.range:
+            ids_in_range.append(deb.id)
+    for deb_id in ids_in_range:
+        team = None
+        if deb_id in debris[Team.BLUE]:
+            team = Team.BLUE
+        elif deb_id in debris[Team.RED]:
+            team = Team.RED
+        debris[team][deb_id].health -= TowerType.BOMBER.damage
+        if debris[team][deb_id].health <= 0:
+            del debris[team][deb_id]
+
+def bomb_vectorized(gs: GameState, rc: RobotController, tower_id: int):
+    rc.bomb(tower_id)
+
+def baseline_per_call_us(map: Map, cluster_size: int, health: int) -> float:
+    gs, tower_id = build_state(map, cluster_size, health)
+    total = 0
+    for i in range(CALLS):
+        debris = baseline_debris(gs)
+        start = time.perf_counter()
+        bomb_per_debris(gs, debris, tower_id)
+        total += time.perf_counter() - start
+    return total / CALLS * 1e6
+
+def per_call_us(map: Map, cluster_size: int, health: int, bomb) -> float:
+    gs, tower_id = build_state(map, cluster_size, health)
+    rc = RobotController(Team.BLUE, gs)
+    store = gs.debris[Team.BLUE]
+    columns = np.zeros((len(store.COLUMNS), len(store.id)))
+    store.export(columns)
+    n = len(store)
+    total = 0
+    for i in range(CALLS):
+        store.load(columns, n)
+        gs.start_tower_cooldown(gs.towers[Team.BLUE][tower_id], 0)
+        start = time.perf_counter()
+        bomb(gs, rc, tower_id)
+        total += time.perf_counter() - start
+    return total / CALLS * 1e6
+
+def main():
+    map = Map("maps/biki_bott.awap24m")
+    print(f"map {map.name}, bomber damage {TowerType.BOMBER.damage}")
+    print(f"{'debris':>7} {'cluster':<8} {'array (us)':>11} {'per debris (us)':>16} {'speedup':>8}")
+    for cluster_size in CLUSTER_SIZES:
+        for (name, health) in [("survive", 10 * TowerType.BOMBER.damage), ("die", TowerType.BOMBER.damage)]:
+            new = per_call_us(map, cluster_size, health, bomb_vectorized)
+            old = baseline_per_call_us(map, cluster_size, health)
+            print(f"{cluster_size:>7} {name:<8} {new:>11.1f} {old:>16.1f} {old / new:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
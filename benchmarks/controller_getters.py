@@ -0,0 +1,71 @@
+'''
+Per-call cost of the RobotController getters with 500 towers and 1000 debris,
+compared with deep-copying the same objects (the previous behaviour).
+"cold" calls follow a change to the game state, "cached" calls repeat a read with no change in between.
+
+Run from the repository root:
+python -m benchmarks.controller_getters
+'''
+import copy
+import timeit
+
+from benchmarks.map_sharing import previous_contents
+from src.game_constants import Team, TowerType
+from src.game_state import GameState
+from src.map import Map
+from src.robot_controller import RobotController
+
+NUM_TOWERS = 500
+NUM_DEBRIS = 1000
+CALLS = 200
+
+def build_state() -> GameState:
+    gs = GameState(Map("maps/biki_bott.awap24m"))
+    tower_types = list(TowerType)
+    built = 0
+    for x in range(gs.map.width):
+        for y in range(gs.map.height):
+            if built < NUM_TOWERS and gs.is_placeable(Team.BLUE, x, y):
+                gs.build_tower(Team.BLUE, tower_types[built % len(tower_types)], x, y)
+                built += 1
+    for i in range(NUM_DEBRIS):
+        gs.spawn_debris(Team.BLUE, 1 + i % 20, 10 + i, False)
+    # Spread the debris along the path
+    for i in range(gs.map.path_length - 1):
+        gs.decrement_debris_cooldowns()
+        gs.advance_debris()
+    return gs
+
+def per_call_us(fn) -> float:
+    return timeit.timeit(fn, number=CALLS) / CALLS * 1e6
+
+def main():
+    gs = build_state()
+    rc = RobotController(Team.BLUE, gs)
+    towers = list(gs.towers[Team.BLUE].values())
+    debris = gs.debris[Team.BLUE].values()
+    print(f"{len(towers)} towers, {len(debris)} debris, map {gs.map.name}")
+
+    def cold(getter):
+        def call():
+            gs.generation += 1
+            return getter()
+        return call
+
+    # A Map deep-copies to itself now, so copy its contents as they used to be stored
+    map_contents = previous_contents(gs.map)
+    get_towers = lambda: rc.get_towers(Team.BLUE)
+    get_debris = lambda: rc.get_debris(Team.BLUE)
+    rows = [
+        ("get_towers (cold)", per_call_us(cold(get_towers)), per_call_us(lambda: copy.deepcopy(towers))),
+        ("get_towers (cached)", per_call_us(get_towers), per_call_us(lambda: copy.deepcopy(towers))),
+        ("get_debris (cold)", per_call_us(cold(get_debris)), per_call_us(lambda: copy.deepcopy(debris))),
+        ("get_debris (cached)", per_call_us(get_debris), per_call_us(lambda: copy.deepcopy(debris))),
+        ("get_map", per_call_us(rc.get_map), per_call_us(lambda: copy.deepcopy(map_contents))),
+    ]
+    print(f"{'call':<20} {'snapshot (us)':>15} {'deepcopy (us)':>15} {'speedup':>9}")
+    for (name, new, old) in rows:
+        print(f"{name:<20} {new:>15.1f} {old:>15.1f} {old / new:>8.1f}x")
+
+if __name__ == "__main__":
+    main()
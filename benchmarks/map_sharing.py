@@ -0,0 +1,64 @@
+'''
+Time and memory a game spends on copies of its map, sharing one immutable Map compared with
+deep-copying it for each bot and again for each controller's get_map (the previous behaviour).
+A Map now deep-copies to itself, so the previous copies are made from its contents in the
+lists and dicts they used to be stored in.
+
+Run from the repository root:
+python -m benchmarks.map_sharing
+'''
+import copy
+import timeit
+import tracemalloc
+from types import MappingProxyType
+
+from src.map import Map
+
+# One copy per bot in Game.__init__, and one per controller the first time a bot calls get_map
+COPIES_PER_GAME = 4
+GAMES = 200
+
+def mutable_contents(value):
+    if isinstance(value, tuple):
+        return [mutable_contents(item) for item in value]
+    if isinstance(value, (dict, MappingProxyType)):
+        return {key: mutable_contents(item) for (key, item) in value.items()}
+    return value
+
+def previous_contents(map: Map) -> dict:
+    '''
+    Returns the map's contents as they used to be stored, which is what copying a map used to copy.
+    The read-only views of its caches are left out, the contents already hold the caches as dicts.
+    '''
+    return mutable_contents(map.__getstate__())
+
+def copy_per_game(contents: dict) -> list:
+    return [copy.deepcopy(contents) for i in range(COPIES_PER_GAME)]
+
+def share_per_game(map: Map) -> list:
+    return [copy.deepcopy(map) for i in range(COPIES_PER_GAME)]
+
+def retained_bytes(fn) -> int:
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    result = fn()
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del result
+    return after - before
+
+def main():
+    map = Map("maps/biki_bott.awap24m")
+    contents = previous_contents(map)
+    print(f"map {map.name} ({map.width}x{map.height}, path of {map.path_length} tiles), {COPIES_PER_GAME} copies per game")
+
+    shared_us = timeit.timeit(lambda: share_per_game(map), number=GAMES) / GAMES * 1e6
+    copied_us = timeit.timeit(lambda: copy_per_game(contents), number=GAMES) / GAMES * 1e6
+    shared_kb = retained_bytes(lambda: share_per_game(map)) / 1024
+    copied_kb = retained_bytes(lambda: copy_per_game(contents)) / 1024
+    print(f"{'':<9} {'time per game (us)':>19} {'memory per game (KiB)':>22}")
+    print(f"{'shared':<9} {shared_us:>19.1f} {shared_kb:>22.1f}")
+    print(f"{'deepcopy':<9} {copied_us:>19.1f} {copied_kb:>22.1f}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+'''
+Wall-clock time of run_game with trivial bots, using a persistent worker thread per player
+compared with starting a new thread for each player every turn (the previous behaviour).
+
+Run from the repository root:
+python -m benchmarks.run_game
+'''
+import time
+from threading import Thread
+
+from src.game_constants import Team
+from src.game_ext import GameExt
+from src.map import Map
+from src.player import Player
+from src.robot_controller import RobotController
+
+GAMES = 5
+
+class NothingPlayer(Player):
+    def play_turn(self, rc: RobotController):
+        pass
+
+class ThreadPerTurnGame(GameExt):
+    def call_player_code(self, team: Team):
+        player = self.blue_player if team == Team.BLUE else self.red_player
+        controller = self.blue_controller if team == Team.BLUE else self.red_controller
+        thread = Thread(target=player.play_turn, args=[controller], daemon=True)
+
+        funcTime = time.perf_counter()
+        thread.start()
+        thread.join(self.gs.time_remaining[team])
+        funcTime = time.perf_counter() - funcTime
+
+        if thread.is_alive() or funcTime > self.gs.time_remaining[team]:
+            self.gs.time_remaining[team] = 0
+            return False
+        self.gs.time_remaining[team] -= funcTime
+        return True
+
+def time_games(game_class, map_inst: Map) -> tuple:
+    turns = 0
+    start = time.perf_counter()
+    for i in range(GAMES):
+        game = game_class("blue", NothingPlayer(map_inst), "red", NothingPlayer(map_inst), map_inst)
+        game.run_game()
+        turns += game.gs.turn
+    return (time.perf_counter() - start, turns)
+
+def main():
+    map_inst = Map("maps/spiral.awap24m")
+    for (name, game_class) in [("thread per turn", ThreadPerTurnGame), ("persistent worker", GameExt)]:
+        elapsed, turns = time_games(game_class, map_inst)
+        print(f"{name:<18} {elapsed:7.3f}s for {GAMES} games ({turns} turns), {elapsed / turns * 1e6:6.1f}us per turn")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+'''
+Per-call cost of picking an auto_snipe target with hundreds of debris in flight, using the
+store's best debris per path index compared with the original auto_snipe, which called can_snipe
+on every debris in a dict of Debris objects and took the max by priority.
+"rebuild" calls follow debris movement, which makes the store recompute the best debris per path index.
+
+Run from the repository root:
+python -m benchmarks.targeting
+'''
+import timeit
+
+from src.debris import DebrisStore
+from src.game_constants import SnipePriority, Team, TowerType
+from src.game_exception import GameException
+from src.map import Map
+
+DEBRIS_COUNTS = [100, 300, 1000]
+CALLS = 200
+
+def build_store(map: Map, num_debris: int) -> DebrisStore:
+    store = DebrisStore(Team.BLUE, map)
+    for i in range(num_debris):
+        store.spawn(1 + i % 20, 10 + i % 37, False)
+    # Spread the debris along the path
+    for i in range(map.path_length - 1):
+        store.decrement_cooldowns()
+        store.advance()
+    return store
+
+class BaselineDebris:
+    '''
+    The fields of the original mutable Debris that auto_snipe reads
+    '''
+    def __init__(self, id: int, progress: int, x: int, y: int, total_health: int):
+        self.id = id
+        self.progress = progress
+        self.x = x
+        self.y = y
+        self.total_health = total_health
+
+class BaselineTower:
+    def __init__(self, x: int, y: int):
+        self.type = TowerType.GUNSHIP
+        self.x = x
+        self.y = y
+        self.current_cooldown = 0
+
+def baseline_debris(store: DebrisStore) -> dict:
+    '''
+    Returns the debris in store as the original engine stored them, {id: Debris} in id order
+    '''
+    columns = [store.id, store.progress, store.x, store.y, store.total_health]
+    return {row[0]: BaselineDebris(*row) for row in zip(*(column[:len(store)].tolist() for column in columns))}
+
+def can_snipe(towers: dict, debris: dict, tower_id: int, debris_id: int) -> bool:
+    # RobotController.can_snipe as it was before the debris store
+    if tower_id not in towers:
+        raise GameException("can_snipe(): Invalid tower id")
+    if debris_id not in debris:
+        raise GameException("can_snipe(): Invalid debris id")
+    tower = towers[tower_id]
+    deb = debris[debris_id]
+    if tower.type != TowerType.GUNSHIP:
+        raise GameException("can_snipe(): Tower is not a gunship")
+    if tower.current_cooldown > 0:
+        return False
+    dx = deb.x - tower.x
+    dy = deb.y - tower.y
+    if dx**2 + dy**2 > TowerType.GUNSHIP.range:
+        return False
+    return True
+
+def baseline_target(towers: dict, debris: dict, tower_id: int, priority: SnipePriority) -> int:
+    '''
+    Returns the id of the debris the original auto_snipe would snipe, or -1
+    '''
+    tower = towers[tower_id]
+    in_range = []
+    for deb in debris.values():
+        if can_snipe(towers, debris, tower_id, deb.id):
+            in_range.append(deb)
+    if len(in_range) == 0:
+        return -1
+    if priority == SnipePriority.FIRST:
+        get_priority = lambda deb: deb.progress
+    elif priority == SnipePriority.LAST:
+        get_priority = lambda deb: -deb.progress
+    elif priority == SnipePriority.CLOSE:
+        get_priority = lambda deb: -(deb.x - tower.x)**2 - (deb.y - tower.y)**2
+    elif priority == SnipePriority.WEAK:
+        get_priority = lambda deb: -deb.total_health
+    else:
+        get_priority = lambda deb: deb.total_health
+    return max(in_range, key=get_priority).id
+
+def per_call_us(fn) -> float:
+    return timeit.timeit(fn, number=CALLS) / CALLS * 1e6
+
+def main():
+    map = Map("maps/biki_bott.awap24m")
+    # A gunship next to the middle of the path
+    middle = map.path_length // 2
+    x, y = int(map.path_x[middle]), int(map.path_y[middle]) + 1
+    path_indices = map.path_indices_in_range(x, y, TowerType.GUNSHIP.range)
+    towers = {0: BaselineTower(x, y)}
+    print(f"map {map.name}, gunship covering {len(path_indices)} of {map.path_length} path tiles")
+
+    print(f"{'debris':>7} {'priority':<9} {'indexed (us)':>12} {'rebuild (us)':>13} {'original (us)':>14} {'speedup':>8}")
+    for num_debris in DEBRIS_COUNTS:
+        store = build_store(map, num_debris)
+        debris = baseline_debris(store)
+        for priority in SnipePriority:
+            row = store.best_in_range(x, y, TowerType.GUNSHIP.range, priority)
+            assert (-1 if row == -1 else int(store.id[row])) == baseline_target(towers, debris, 0, priority)
+            indexed = per_call_us(lambda: store.best_in_range(x, y, TowerType.GUNSHIP.range, priority))
+            def rebuild():
+                store.path_bests = {}
+                return store.best_in_range(x, y, TowerType.GUNSHIP.range, priority)
+            rebuilt = per_call_us(rebuild)
+            original = per_call_us(lambda: baseline_target(towers, debris, 0, priority))
+            print(f"{num_debris:>7} {priority.name:<9} {indexed:>12.1f} {rebuilt:>13.1f} {original:>14.1f} {original / indexed:>7.1f}x")
+
+if __name__ == "__main__":
+    main()
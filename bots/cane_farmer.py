@@ -18,29 +18,8 @@ def optimal_tower(tower_tiles):
     return tile
 
 def num_tiles_in_range(map: Map):
-    # Upper bounds on bounding square
-    GUNX = GUNY = int(np.sqrt(TowerType.GUNSHIP.range))
-    BOMBX = BOMBY = int(np.sqrt(TowerType.BOMBER.range))
-
-    gunship_tiles = np.zeros(shape=(map.width, map.height), dtype=int)
-    bomber_tiles = np.zeros(shape=(map.width, map.height), dtype=int)
-    for tile in map.path:
-        x, y = tile
-        for tower_x in range(x - GUNX, x + GUNX + 1):
-            for tower_y in range(y - GUNY, y + GUNY + 1):
-                if not map.is_space(tower_x, tower_y):
-                    continue
-                if (x - tower_x)**2 + (y - tower_y)**2 <= TowerType.GUNSHIP.range:
-                    gunship_tiles[tower_x, tower_y] += 1
-
-        for tower_x in range(x - BOMBX, x + BOMBX + 1):
-            for tower_y in range(y - BOMBY, y + BOMBY + 1):
-                if not map.is_space(tower_x, tower_y):
-                    continue
-                if (x - tower_x)**2 + (y - tower_y)**2 <= TowerType.BOMBER.range:
-                    bomber_tiles[tower_x, tower_y] += 1
-
-    return (gunship_tiles, bomber_tiles)
+    # Copied, since the map's coverage grids are read-only and tiles get zeroed out once built on
+    return (map.coverage(TowerType.GUNSHIP).copy(), map.coverage(TowerType.BOMBER).copy())
 
 MINIMUM_HEALTH = 51 # Enough to survive a single gunshot
 GAPFILL = 7
@@ -85,12 +64,7 @@ class BotPlayer(Player):
         self.get_next_farm(rc)
 
     def towers_attack(self, rc: RobotController):
-        towers = rc.get_towers(rc.get_ally_team())
-        for tower in towers:
-            if tower.type == TowerType.GUNSHIP:
-                rc.auto_snipe(tower.id, SnipePriority.FIRST)
-            elif tower.type == TowerType.BOMBER:
-                rc.auto_bomb(tower.id)
+        rc.auto_attack_all(SnipePriority.FIRST)
 
     def play_turn(self, rc: RobotController):
         if len(rc.get_towers(rc.get_ally_team())) >= 5:
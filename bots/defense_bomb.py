@@ -45,12 +45,7 @@ class BotPlayer(Player):
         self.towers_attack(rc)
         
     def towers_attack(self, rc: RobotController):
-        towers = rc.get_towers(rc.get_ally_team())
-        for tower in towers:
-            if tower.type == TowerType.GUNSHIP:
-                rc.auto_snipe(tower.id, SnipePriority.FIRST)
-            elif tower.type == TowerType.BOMBER:
-                rc.auto_bomb(tower.id)
+        rc.auto_attack_all(SnipePriority.FIRST)
 
         # if rc.can_send_debris(1, self.desired_debris_health):
             # rc.send_debris(1, self.desired_debris_health)
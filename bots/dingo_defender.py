@@ -1,9 +1,10 @@
 import random
 from enum import Enum
-from src.game_constants import SnipePriority, TowerType
+from src.game_constants import SnipePriority, Tile, TowerType
 from src.robot_controller import RobotController
 from src.player import Player
 from src.map import Map
+from src.analysis import reinf_value, strike_counts
 import numpy as np
 
 NUM_TOWERS_PER_REINF = 5
@@ -28,55 +29,8 @@ def max_cluster(reinf_tiles):
     return tile
 
 def num_tiles_in_range(map: Map):
-    # Upper bounds on bounding square
-    GUNX = GUNY = int(np.sqrt(TowerType.GUNSHIP.range))
-    BOMBX = BOMBY = int(np.sqrt(TowerType.BOMBER.range))
-
-    gunship_tiles = np.zeros(shape=(map.width, map.height), dtype=int)
-    bomber_tiles = np.zeros(shape=(map.width, map.height), dtype=int)
-    for tile in map.path:
-        x, y = tile
-        for tower_x in range(x - GUNX, x + GUNX + 1):
-            for tower_y in range(y - GUNY, y + GUNY + 1):
-                if not map.is_space(tower_x, tower_y):
-                    continue
-                if (x - tower_x)**2 + (y - tower_y)**2 <= TowerType.GUNSHIP.range:
-                    gunship_tiles[tower_x, tower_y] += 1
-        
-        for tower_x in range(x - BOMBX, x + BOMBX + 1):
-            for tower_y in range(y - BOMBY, y + BOMBY + 1):
-                if not map.is_space(tower_x, tower_y):
-                    continue
-                if (x - tower_x)**2 + (y - tower_y)**2 <= TowerType.BOMBER.range:
-                    bomber_tiles[tower_x, tower_y] += 1
-    
-    return (gunship_tiles, bomber_tiles)
-
-def reinf_value(tower_tiles, num_towers, map):
-    """
-    Returns the best sport to place a reinforcement,
-    assuming you can only place a given number of towers
-    Very inefficient function...
-    """
-    REINFX = REINFY = int(np.sqrt(TowerType.REINFORCER.range))
-    reinf_val = np.zeros(shape=(map.width, map.height), dtype=int)
-    for x in range(map.width):
-        for y in range(map.height):
-            if not map.is_space(x, y):
-                continue
-            value_in_range = []
-            for tower_x in range(x - REINFX, x + REINFX + 1):
-                for tower_y in range(y - REINFY, y + REINFY + 1):
-                    if not(map.is_space(tower_x, tower_y)) or (tower_x == x and tower_y == y):
-                        continue
-                    if (x - tower_x)**2 + (y - tower_y)**2 <= TowerType.REINFORCER.range:
-                        value_in_range.append(tower_tiles[tower_x, tower_y])
-
-            value_in_range.sort()
-            for i in range(min(num_towers, len(value_in_range))):
-                reinf_val[x, y] += value_in_range[len(value_in_range)-1-i]
-
-    return reinf_val
+    # Copied, since the map's coverage grids are read-only and tiles get zeroed out once built on
+    return (map.coverage(TowerType.GUNSHIP).copy(), map.coverage(TowerType.BOMBER).copy())
 
 class BotPlayer(Player):
     def __init__(self, map: Map):
@@ -264,39 +218,9 @@ class BotPlayer(Player):
         Attempt to calculate the ratio of extra times a debris can be hit for single target
         on a windy map where debris leaves and enters the range of the tower
         """
-        # tile = np.unravel_index(np.argmax(self.base_gunship_tiles), self.base_gunship_tiles.shape)
-        # tower_x, tower_y = int(tile[0]), int(tile[1])
-        gunship_strike_mult = []
-        bomber_strike_mult = []
-        for tower_x in range(self.map.width):
-            for tower_y in range(self.map.height):
-                if not self.map.is_space(tower_x, tower_y):
-                    continue
-                since_in_range = 100
-                temp_mult = 0
-                for tile in self.map.path:
-                    x, y = tile
-                    since_in_range += 1
-                    if (x - tower_x)**2 + (y - tower_y)**2 <= TowerType.GUNSHIP.range:
-                        if since_in_range >= TowerType.GUNSHIP.cooldown:
-                            temp_mult += 1
-                            since_in_range = 0
-                # temp_mult *= TowerType.GUNSHIP.cooldown / self.base_gunship_tiles[tower_x, tower_y]
-                # if temp_mult > gunship_strike_mult:
-                gunship_strike_mult.append(temp_mult)
-        
-                since_in_range = 100
-                temp_mult = 0
-                for tile in self.map.path:
-                    x, y = tile
-                    since_in_range += 1
-                    if (x - tower_x)**2 + (y - tower_y)**2 <= TowerType.BOMBER.range:
-                        if since_in_range >= TowerType.BOMBER.cooldown:
-                            temp_mult += 1
-                            since_in_range = 0
-                # if temp_mult > bomber_strike_mult:
-                bomber_strike_mult.append(temp_mult)
-
+        space = self.map.mask(Tile.SPACE)
+        gunship_strike_mult = strike_counts(self.map, TowerType.GUNSHIP.range, TowerType.GUNSHIP.cooldown)[space]
+        bomber_strike_mult = strike_counts(self.map, TowerType.BOMBER.range, TowerType.BOMBER.cooldown)[space]
         gunship_strike_mult = np.average(np.sort(gunship_strike_mult)[-10:])
         bomber_strike_mult = np.average(np.sort(bomber_strike_mult)[-10:])
         return (gunship_strike_mult, bomber_strike_mult)
@@ -534,9 +458,4 @@ class BotPlayer(Player):
         
         
     def towers_attack(self, rc: RobotController):
-        towers = rc.get_towers(rc.get_ally_team())
-        for tower in towers:
-            if tower.type == TowerType.GUNSHIP:
-                rc.auto_snipe(tower.id, SnipePriority.FIRST) # TODO: target enemy with highest current hp
-            elif tower.type == TowerType.BOMBER:
-                rc.auto_bomb(tower.id)
+        rc.auto_attack_all(SnipePriority.FIRST) # TODO: target enemy with highest current hp
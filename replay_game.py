@@ -5,7 +5,8 @@ from src.game_state import GameState
 from src.map import Map
 from src.game_constants import Team, TowerType
 from src.tower import Tower
-from src.debris import Debris
+from src.debris import DebrisStore
+import numpy as np
 import time
 
 # python replay_game.py <mapname>.awap24r [--web]
@@ -56,21 +57,22 @@ def get_tower(team, json_tower):
     res.current_cooldown = cooldown
     return res
 
-def get_debris(team, json_debris):
-    id = json_debris['id']
-    x = json_debris['x']
-    y = json_debris['y']
-    max_health = json_debris['max_health']
-    health = json_debris['health']
-    max_cooldown = json_debris['max_cooldown']
-    cooldown = json_debris['cooldown']
-    sent_by_opponent = json_debris['sent_by_opponent']
+# Debris in a replay are located by tile, the store also needs their position along the path
+path_indices = {tile: i for (i, tile) in enumerate(map.path)}
 
-    res = Debris(team, x, y, max_cooldown, max_health, sent_by_opponent)
-    res.id = id
-    res.current_cooldown = cooldown
-    res.health = health
-    return res
+def load_debris(team, json_debris_list):
+    columns = np.zeros((len(DebrisStore.COLUMNS), len(json_debris_list)))
+    for (i, json_debris) in enumerate(json_debris_list):
+        x = json_debris['x']
+        y = json_debris['y']
+        # Laid out as DebrisStore.COLUMNS, with the current cooldown as written by DebrisStore.export
+        columns[:, i] = (
+            json_debris['id'], path_indices[(x, y)], x, y,
+            json_debris['health'], json_debris['max_health'],
+            json_debris['max_cooldown'], json_debris['cooldown'],
+            json_debris['sent_by_opponent'], isinstance(json_debris['max_health'], int)
+        )
+    gs.debris[team].load(columns, len(json_debris_list))
 
 def set_turn(turn):
     gs.turn = turn['turn_number']
@@ -90,14 +92,8 @@ def set_turn(turn):
         tower = get_tower(Team.RED, json_tower)
         gs.towers[Team.RED][tower.id] = tower
     
-    gs.debris[Team.BLUE] = {}
-    for json_debris in turn['blue_debris']:
-        debris = get_debris(Team.BLUE, json_debris)
-        gs.debris[Team.BLUE][debris.id] = debris
-    gs.debris[Team.RED] = {}
-    for json_debris in turn['red_debris']:
-        debris = get_debris(Team.RED, json_debris)
-        gs.debris[Team.RED][debris.id] = debris
+    load_debris(Team.BLUE, turn['blue_debris'])
+    load_debris(Team.RED, turn['red_debris'])
 
     gs.current_snipes[Team.BLUE] = turn['blue_snipes']
     gs.current_snipes[Team.RED] = turn['red_snipes']
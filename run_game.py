@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 from src.game import Game
+from src.game_constants import GameConstants
 import argparse
 import json
 
@@ -11,6 +12,8 @@ def main():
     parser.add_argument("-m", "--map_path", type=str, required=False)
     parser.add_argument("-c", "--config_file", type=str, required=False)
     parser.add_argument("--render", action="store_true", help="Whether or not to display the game while it is running")
+    parser.add_argument("--sandbox", action="store_true", help="Run each bot in its own process, which is killed if the bot runs out of time")
+    parser.add_argument("--precompute_time", type=float, default=GameConstants.PRECOMPUTE_TIME, help="Seconds each bot's precompute may take before turn 1")
     args = parser.parse_args()
 
     if args.config_file:
@@ -29,7 +32,9 @@ def main():
         blue_path=blue_path,
         red_path=red_path,
         map_path=map_path,
-        render=args.render
+        render=args.render,
+        sandbox=args.sandbox,
+        precompute_time=args.precompute_time
     )
     winner = game.run_game()
     print(f"Winner: {winner}")
@@ -0,0 +1,95 @@
+# Map analysis shared by bots, computed for every tile of a map at once with array operations
+# instead of one Python loop per tile.
+
+import math
+import numpy as np
+
+from src.game_constants import Tile, TowerType
+from src.map import MASK_PADDING, Map, disk_offsets
+
+def neighbour_values(values: np.ndarray, map: Map, r2: int) -> tuple:
+    '''
+    Returns (stack, valid): stack[i][x][y] is values at (x, y) shifted by the i-th offset within r2
+    other than (0, 0), and valid[i][x][y] says whether that neighbour is a space tile on the map
+    '''
+    offsets = [(dx, dy) for (dx, dy) in disk_offsets(r2) if (dx, dy) != (0, 0)]
+    r = int(r2**0.5)
+    padded_values = np.pad(values, r)
+    space = map.mask(Tile.SPACE, padded=True)
+    stack = np.empty((len(offsets), map.width, map.height), dtype=values.dtype)
+    valid = np.empty((len(offsets), map.width, map.height), dtype=bool)
+    for (i, (dx, dy)) in enumerate(offsets):
+        stack[i] = padded_values[r + dx:r + dx + map.width, r + dy:r + dy + map.height]
+        valid[i] = space[MASK_PADDING + dx:MASK_PADDING + dx + map.width, MASK_PADDING + dy:MASK_PADDING + dy + map.height]
+    return (stack, valid)
+
+def reinf_value(tower_tiles: np.ndarray, num_towers: int, map: Map) -> np.ndarray:
+    '''
+    Returns the value of placing a reinforcer on each tile: the sum of the num_towers largest
+    tower_tiles values on the other space tiles in reinforcer range, or 0 off space tiles.
+    Gives exactly what the per-tile loop bots used to run gave, including the int result that
+    float values are truncated into as each one is added, largest first.
+    '''
+    tower_tiles = np.asarray(tower_tiles)
+    stack, valid = neighbour_values(tower_tiles, map, TowerType.REINFORCER.range)
+    reinf_val = np.zeros((map.width, map.height), dtype=int)
+    num_neighbours = len(stack)
+    k = min(num_towers, num_neighbours)
+    if k <= 0:
+        return reinf_val
+
+    # Neighbours that are not space tiles sort below every real value and are then left out by count
+    if np.issubdtype(stack.dtype, np.floating):
+        lowest = -np.inf
+    else:
+        lowest = np.iinfo(stack.dtype).min
+    stack[~valid] = lowest
+    if k < num_neighbours:
+        stack = np.partition(stack, num_neighbours - k, axis=0)[num_neighbours - k:]
+    largest = np.sort(stack, axis=0)[::-1]
+
+    counts = valid.sum(axis=0)
+    counts[~map.mask(Tile.SPACE)] = 0
+    for i in range(k):
+        reinf_val = np.where(i < counts, reinf_val + largest[i], reinf_val).astype(int)
+    return reinf_val
+
+# Strike counts treat the tower as having been ready this many path tiles before the first one
+STRIKE_LEAD = 100
+
+def strike_counts(map: Map, r2: int, cooldown: float) -> np.ndarray:
+    '''
+    Returns an int array indexed [x][y]: the number of times a tower at (x, y) with range r2 and the
+    given cooldown can strike one debris walking the path, striking whenever the debris is in range
+    and the cooldown has run out (the cooldown counts path tiles walked). 0 off space tiles.
+    '''
+    offsets = np.array(disk_offsets(r2))
+    # Every (tile, path index) pair in range, as tile * stride + path index. Each tile's pairs are
+    # contiguous and sorted by path index, and the runs of consecutive indices are its passes in range.
+    x = (map.path_x[None, :] + offsets[:, 0, None]).ravel()
+    y = (map.path_y[None, :] + offsets[:, 1, None]).ravel()
+    index = np.tile(np.arange(map.path_length), len(offsets))
+    inside = (0 <= x) & (x < map.width) & (0 <= y) & (y < map.height)
+    step = max(1, math.ceil(cooldown))
+    stride = map.path_length + step
+    tile = x[inside] * map.height + y[inside]
+    keys = np.sort(tile * stride + index[inside])
+
+    # Strike every tile in one round per strike: each round finds, for every tile still striking,
+    # the first path index in range at least one cooldown after its previous strike
+    sorted_tiles = keys // stride
+    starts = np.flatnonzero(np.diff(sorted_tiles, prepend=-1))
+    tiles = sorted_tiles[starts]
+    ends = np.r_[starts[1:], len(keys)]
+    next_index = np.full(len(tiles), max(0, math.ceil(cooldown - STRIKE_LEAD - 1)))
+    counts = np.zeros(map.width * map.height, dtype=int)
+    while len(tiles) > 0:
+        found = np.searchsorted(keys, tiles * stride + next_index)
+        striking = found < ends
+        tiles, ends, found = tiles[striking], ends[striking], found[striking]
+        counts[tiles] += 1
+        next_index = keys[found] % stride + step
+
+    counts = counts.reshape(map.width, map.height)
+    counts[~map.mask(Tile.SPACE)] = 0
+    return counts
@@ -0,0 +1,114 @@
+# Arrays that bots compute from a map, kept on disk so later games on the same map can load them
+# instead of computing them again.
+#
+# Entries are keyed by the bot that saved them, the map's content hash and a key chosen by the bot.
+# Anything else a result depends on (the bot's parameters, or a version to bump when its analysis
+# changes) belongs in the key. A bot is identified by the hash of its file, so the opponent, or
+# another bot that happens to use the same keys, never reaches its entries through the cache, and
+# editing the bot starts it on a fresh set of entries.
+
+import hashlib
+import os
+import threading
+import numpy as np
+
+from src.map import Map
+
+CACHE_DIR = "analysis_cache"
+MAX_ENTRIES = 1024
+MAX_BYTES = 256 * 1024 * 1024
+
+def bot_hash(bot_path: str) -> str:
+    with open(bot_path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+class AnalysisCache:
+    '''
+    Cache of NumPy arrays computed from one map by the bot at bot_path, shared by every game and arena worker
+    using the same directory.
+    Once it holds more than max_entries arrays or max_bytes, the least recently used ones are removed.
+    '''
+    def __init__(self, map: Map, bot_path: str, directory: str = CACHE_DIR, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        self.owner = bot_hash(bot_path)
+        self.map_hash = map.content_hash
+        self.directory = directory
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+
+    def path(self, key: str) -> str:
+        name = hashlib.sha256(f"{self.owner}-{self.map_hash}-{key}".encode()).hexdigest()
+        return os.path.join(self.directory, f"{name}.npy")
+
+    def load(self, key: str):
+        '''
+        Returns the array saved under key for this map, or None
+        '''
+        path = self.path(key)
+        try:
+            array = np.load(path, allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+        try:
+            # Modification times order entries for eviction
+            os.utime(path)
+        except OSError:
+            pass
+        return array
+
+    def save(self, key: str, array: np.ndarray):
+        '''
+        Saves array under key for this map. Failing to write, e.g. to a read-only directory, is not an error.
+        '''
+        path = self.path(key)
+        # Write then rename, so a concurrent or interrupted run never sees a partial file
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(tmp_path, 'wb') as f:
+                np.save(f, np.asarray(array), allow_pickle=False)
+            os.replace(tmp_path, path)
+        except OSError:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            return
+        self.evict()
+
+    def get(self, key: str, compute) -> np.ndarray:
+        '''
+        Returns the array saved under key for this map, or computes it with compute() and saves it
+        '''
+        array = self.load(key)
+        if array is None:
+            array = np.asarray(compute())
+            self.save(key, array)
+        return array
+
+    def evict(self):
+        '''
+        Removes the least recently used arrays until the cache is within max_entries and max_bytes
+        '''
+        entries = []
+        try:
+            with os.scandir(self.directory) as it:
+                for entry in it:
+                    if not entry.name.endswith(".npy"):
+                        continue
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        # Removed by another process
+                        continue
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except OSError:
+            return
+
+        entries.sort(reverse=True)
+        total_bytes = 0
+        for (i, (mtime, size, path)) in enumerate(entries):
+            total_bytes += size
+            if i < self.max_entries and total_bytes <= self.max_bytes:
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                pass
@@ -1,31 +1,356 @@
 from __future__ import annotations
-from src.game_constants import Team
+from dataclasses import dataclass
+import itertools
+from typing import ClassVar
+import numpy as np
+from src.game_constants import SnipePriority, Team
+from src.game_exception import GameException
+from src.map import Map
 
+@dataclass(frozen=True, slots=True)
 class Debris:
-    id_counter = 0
-
-    def __init__(
-            self,
-            team: Team,
-            x: int,
-            y: int,
-            cooldown: int,
-            health: int,
-            sent_by_opponent: bool
-    ) -> None:
-        self.id = self.increment()
-        self.team = team
-        self.progress = 0
-        self.x = x
-        self.y = y
-        self.total_cooldown = cooldown
-        self.current_cooldown = cooldown
-        self.total_health = health
-        self.health = health
-        self.sent_by_opponent = sent_by_opponent
-    
+    '''
+    Read-only snapshot of one debris, as handed out to bots.
+    The live values are kept in the team's DebrisStore.
+    '''
+    id_counter: ClassVar[int] = 0
+
+    id: int
+    team: Team
+    progress: int
+    x: int
+    y: int
+    total_cooldown: int
+    current_cooldown: int
+    total_health: int
+    health: int
+    sent_by_opponent: bool
+
     @staticmethod
     def increment() -> int:
         res = Debris.id_counter
         Debris.id_counter += 1
         return res
+
+class DebrisStore:
+    '''
+    Columnar storage for all debris of one team.
+    Rows are kept in spawn order, which is also increasing id order.
+
+    For targeting, the best debris on each path index is also tracked (see path_best), which lets
+    best_in_range find a tower's target by looking only at the path tiles it covers.
+
+    Debris are moved by a timing wheel: each debris stores the tick at which it next moves, and the
+    ids due on each tick are kept in a bucket, so a tick only touches the debris that move on it.
+    A debris' current cooldown is the number of ticks until its next move.
+    '''
+    INITIAL_CAPACITY = 64
+
+    def __init__(self, team: Team, map: Map) -> None:
+        self.team = team
+        self.map = map
+        self.path_x = map.path_x
+        self.path_y = map.path_y
+        self.path_length = map.path_length
+        self.size = 0
+        # Number of times decrement_cooldowns has been called
+        self.tick = 0
+        # tick -> arrays of ids of debris that move on that tick. Ids of debris that died in
+        # the meantime are left in their bucket and skipped when it comes up.
+        self.wheel = {}
+
+        capacity = DebrisStore.INITIAL_CAPACITY
+        self.id = np.zeros(capacity, dtype=np.int64)
+        self.progress = np.zeros(capacity, dtype=np.int64)
+        self.x = np.zeros(capacity, dtype=np.int64)
+        self.y = np.zeros(capacity, dtype=np.int64)
+        self.health = np.zeros(capacity, dtype=np.float64)
+        self.total_health = np.zeros(capacity, dtype=np.float64)
+        self.total_cooldown = np.zeros(capacity, dtype=np.int64)
+        self.next_move = np.zeros(capacity, dtype=np.int64)
+        self.sent_by_opponent = np.zeros(capacity, dtype=bool)
+        # Health is stored as float64, this remembers which debris were spawned with int health
+        self.integral_health = np.zeros(capacity, dtype=bool)
+        # Number of debris on each path index. The extra last entry counts debris that
+        # reached the end of the path while advancing, until they are removed.
+        self.occupancy = np.zeros(self.path_length + 1, dtype=np.int64)
+        # "weak"/"strong" -> every row sorted by total health, kept until debris spawn
+        self.health_orders = {}
+        # "id"/"weak"/"strong" -> path_best array, kept until debris move, spawn or die
+        self.path_bests = {}
+
+    COLUMNS = [
+        "id", "progress", "x", "y", "health", "total_health",
+        "total_cooldown", "next_move", "sent_by_opponent", "integral_health"
+    ]
+
+    def __len__(self) -> int:
+        return self.size
+
+    def __contains__(self, debris_id: int) -> bool:
+        return self.row_of(debris_id) >= 0
+
+    def __getitem__(self, debris_id: int) -> Debris:
+        row = self.row_of(debris_id)
+        if row < 0:
+            raise KeyError(debris_id)
+        return self.view(row)
+
+    def row_of(self, debris_id: int) -> int:
+        '''
+        Returns the row holding debris_id, or -1 if there is no such debris
+        '''
+        row = int(np.searchsorted(self.id[:self.size], debris_id))
+        if row < self.size and self.id[row] == debris_id:
+            return row
+        return -1
+
+    def spawn(self, cooldown: int, health: int, sent_by_opponent: bool) -> int:
+        if self.size == len(self.id):
+            self.grow()
+        row = self.size
+        self.id[row] = Debris.increment()
+        self.progress[row] = 0
+        self.x[row] = self.path_x[0]
+        self.y[row] = self.path_y[0]
+        self.health[row] = health
+        self.total_health[row] = health
+        self.total_cooldown[row] = cooldown
+        self.next_move[row] = self.tick + cooldown
+        self.sent_by_opponent[row] = sent_by_opponent
+        self.integral_health[row] = isinstance(health, int)
+        self.size += 1
+        self.occupancy[0] += 1
+        self.health_orders = {}
+        self.path_bests = {}
+        self.schedule(self.id[row:row + 1].copy(), int(self.next_move[row]))
+        return int(self.id[row])
+
+    def grow(self):
+        for name in DebrisStore.COLUMNS:
+            column = getattr(self, name)
+            grown = np.zeros(2 * len(column), dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+
+    def keep(self, mask: np.ndarray):
+        '''
+        Removes every live row whose entry in mask is False, preserving order
+        '''
+        n = self.size
+        kept = int(np.count_nonzero(mask))
+        if kept == n:
+            return
+        np.subtract.at(self.occupancy, self.progress[:n][~mask], 1)
+        # Dropping rows from a sorted order leaves it sorted, so health orders only need renumbering
+        new_rows = np.cumsum(mask) - 1
+        def renumber(order):
+            return new_rows[order[mask[order]]]
+        self.health_orders = {key: renumber(order) for (key, order) in self.health_orders.items()}
+        self.path_bests = {}
+        for name in DebrisStore.COLUMNS:
+            column = getattr(self, name)
+            column[:kept] = column[:n][mask]
+        self.size = kept
+
+    def export(self, out: np.ndarray):
+        '''
+        Writes the live rows into out, a float64 array of shape (len(COLUMNS), capacity).
+        next_move is written as the current cooldown, so that the output does not depend on tick.
+        '''
+        n = self.size
+        for (i, name) in enumerate(DebrisStore.COLUMNS):
+            out[i, :n] = getattr(self, name)[:n]
+        out[DebrisStore.COLUMNS.index("next_move"), :n] -= self.tick
+
+    def load(self, columns: np.ndarray, n: int):
+        '''
+        Replaces every row with the first n rows of columns, as written by export
+        '''
+        while len(self.id) < n:
+            self.grow()
+        for (i, name) in enumerate(DebrisStore.COLUMNS):
+            getattr(self, name)[:n] = columns[i, :n]
+        self.next_move[:n] += self.tick
+        self.size = n
+        self.wheel = {}
+        for tick in np.unique(self.next_move[:n]).tolist():
+            self.schedule(self.id[:n][self.next_move[:n] == tick], tick)
+        self.occupancy = np.bincount(self.progress[:n], minlength=self.path_length + 1)
+        self.health_orders = {}
+        self.path_bests = {}
+
+    def health_value(self, row: int, column: np.ndarray):
+        if self.integral_health[row]:
+            return int(column[row])
+        return float(column[row])
+
+    def view(self, row: int) -> Debris:
+        return Debris(
+            int(self.id[row]),
+            self.team,
+            int(self.progress[row]),
+            int(self.x[row]),
+            int(self.y[row]),
+            int(self.total_cooldown[row]),
+            int(self.next_move[row] - self.tick),
+            self.health_value(row, self.total_health),
+            self.health_value(row, self.health),
+            bool(self.sent_by_opponent[row])
+        )
+
+    def views(self, rows) -> list[Debris]:
+        return [self.view(row) for row in rows]
+
+    def values(self) -> list[Debris]:
+        n = self.size
+        integral = self.integral_health[:n].tolist()
+        total_health = [int(h) if i else h for (h, i) in zip(self.total_health[:n].tolist(), integral)]
+        health = [int(h) if i else h for (h, i) in zip(self.health[:n].tolist(), integral)]
+        return list(map(
+            Debris,
+            self.id[:n].tolist(), itertools.repeat(self.team, n), self.progress[:n].tolist(),
+            self.x[:n].tolist(), self.y[:n].tolist(),
+            self.total_cooldown[:n].tolist(), (self.next_move[:n] - self.tick).tolist(),
+            total_health, health, self.sent_by_opponent[:n].tolist()
+        ))
+
+    def path_occupancy(self) -> np.ndarray:
+        '''
+        Returns an array over path indices holding the number of debris on each. It is updated in place.
+        '''
+        return self.occupancy[:self.path_length]
+
+    def any_in_path_indices(self, path_indices: np.ndarray) -> bool:
+        return bool(self.occupancy[path_indices].any())
+
+    def rows_in_path_range(self, path_mask: np.ndarray) -> np.ndarray:
+        '''
+        Returns the rows of debris whose progress is covered by path_mask (see Map.path_mask_in_range).
+        This is one gather over every live debris, so it is linear in their number, not in the number in range.
+        '''
+        return np.flatnonzero(path_mask[self.progress[:self.size]])
+
+    def health_order(self, key: str) -> np.ndarray:
+        '''
+        Returns every row sorted by increasing ("weak") or decreasing ("strong") total health, with ties in id order
+        '''
+        if key not in self.health_orders:
+            total_health = self.total_health[:self.size]
+            self.health_orders[key] = np.argsort(total_health if key == "weak" else -total_health, kind="stable")
+        return self.health_orders[key]
+
+    def path_best(self, key: str) -> np.ndarray:
+        '''
+        Returns an array over path indices holding, for the debris on each path index, the lowest row ("id")
+        or the lowest position in health_order(key) ("weak"/"strong"). Path indices with no debris hold len(self).
+        '''
+        if key not in self.path_bests:
+            n = self.size
+            if key == "id":
+                ranks = np.arange(n)
+            else:
+                ranks = np.empty(n, dtype=np.int64)
+                ranks[self.health_order(key)] = np.arange(n)
+            best = np.full(self.path_length, n, dtype=np.int64)
+            np.minimum.at(best, self.progress[:n], ranks)
+            self.path_bests[key] = best
+        return self.path_bests[key]
+
+    def best_in_range(self, x: int, y: int, r2: int, priority: SnipePriority) -> int:
+        '''
+        Returns the row of the debris within r2 of (x, y) that a gunship there would auto_snipe
+        with the given priority, or -1 if there is no debris in range.
+        Among debris of equal priority, the one with the lowest id is picked.
+        '''
+        n = self.size
+        if priority == SnipePriority.WEAK or priority == SnipePriority.STRONG:
+            key = "weak" if priority == SnipePriority.WEAK else "strong"
+            best = self.path_best(key)[self.map.path_indices_in_range(x, y, r2)].min(initial=n)
+            return -1 if best == n else int(self.health_order(key)[best])
+
+        if priority == SnipePriority.CLOSE:
+            # Every debris on a path index is on the same tile, so the closest are on the first occupied index
+            indices, distances = self.map.path_indices_by_distance(x, y, r2)
+            if len(indices) == 0:
+                return -1
+            first_rows = self.path_best("id")[indices]
+            occupied = first_rows < n
+            nearest = int(np.argmax(occupied))
+            if not occupied[nearest]:
+                return -1
+            farthest = np.searchsorted(distances, distances[nearest], side="right")
+            return int(first_rows[nearest:farthest].min())
+
+        # Lowest id debris on each covered path index
+        first_rows = self.path_best("id")[self.map.path_indices_in_range(x, y, r2)]
+        occupied = np.flatnonzero(first_rows < n)
+        if len(occupied) == 0:
+            return -1
+        if priority == SnipePriority.FIRST:
+            return int(first_rows[occupied[-1]])
+        elif priority == SnipePriority.LAST:
+            return int(first_rows[occupied[0]])
+        else:
+            raise GameException("Invalid priority passed to auto_snipe")
+
+    def schedule(self, ids: np.ndarray, tick: int):
+        self.wheel.setdefault(tick, []).append(ids)
+
+    def decrement_cooldowns(self):
+        # Cooldowns are counted down from next_move, so this only has to move the clock
+        self.tick += 1
+
+    def advance(self) -> list:
+        '''
+        Moves every debris whose cooldown is over one tile along the path.
+        Debris that reach the end of the path are removed, and their total healths are returned in id order.
+        '''
+        n = self.size
+        bucket = self.wheel.pop(self.tick, None)
+        if bucket is None or n == 0:
+            return []
+        ids = bucket[0] if len(bucket) == 1 else np.concatenate(bucket)
+        rows = np.minimum(np.searchsorted(self.id[:n], ids), n - 1)
+        due = rows[self.id[rows] == ids]
+        if len(due) == 0:
+            return []
+        total_cooldown = self.total_cooldown[due]
+        self.next_move[due] = self.tick + total_cooldown
+        np.subtract.at(self.occupancy, self.progress[due], 1)
+        self.progress[due] += 1
+        progress = self.progress[due]
+        np.add.at(self.occupancy, progress, 1)
+        self.path_bests = {}
+
+        moving = progress < self.path_length
+        moved = due[moving]
+        self.x[moved] = self.path_x[progress[moving]]
+        self.y[moved] = self.path_y[progress[moving]]
+        # Debris that moved together usually share a cooldown, and so their next move
+        cooldown = int(total_cooldown[0])
+        if (total_cooldown == cooldown).all():
+            self.schedule(ids if len(moved) == len(ids) else self.id[moved], self.tick + cooldown)
+        else:
+            for cooldown in np.unique(total_cooldown[moving]).tolist():
+                self.schedule(self.id[moved[total_cooldown[moving] == cooldown]], self.tick + cooldown)
+
+        if moving.all():
+            return []
+        # Leaked debris are reported in id order
+        leaked = np.sort(due[~moving])
+        leaked_health = [self.health_value(row, self.total_health) for row in leaked]
+        mask = np.ones(n, dtype=bool)
+        mask[leaked] = False
+        self.keep(mask)
+        return leaked_health
+
+    def damage(self, rows: np.ndarray, damage: int):
+        '''
+        Applies damage to the given rows and removes any debris left with no health
+        '''
+        n = self.size
+        self.health[rows] -= damage
+        alive = self.health[:n] > 0
+        if not alive.all():
+            self.keep(alive)
@@ -1,18 +1,19 @@
 # Execute the actual game, starts the game and keep tracks of everything
 # Import all other classes
 
-import copy
 import importlib.util
 import random
 import sys
 import os
 from src.game_state import GameState
 from src.robot_controller import RobotController
-from src.game_constants import Team, GameConstants, TowerType, get_debris_schedule
+from src.game_constants import Team, GameConstants, get_debris_schedule
 from src.player import Player
 from src.map import Map
 from src.replay import Replay
-from threading import Thread
+from src.player_worker import PlayerWorker
+from src.sandbox import SandboxedPlayer
+from src.precompute import Precompute, overrides_precompute
 import time
 
 def import_file(module_name, file_path):
@@ -23,9 +24,13 @@ def import_file(module_name, file_path):
     return module
 
 class Game:
-    def __init__(self, blue_path: str, red_path: str, map_path: str, output_replay=False, render=False):
+    def __init__(self, blue_path: str, red_path: str, map_path: str, output_replay=False, render=False, sandbox=False, seed=None, precompute_time=GameConstants.PRECOMPUTE_TIME):
         self.output_replay = output_replay
         self.render = render
+        # Seconds each player's precompute may take before turn 1
+        self.precompute_time = precompute_time
+        # Only used to break exact ties, seeded so that results can be reproduced
+        self.random = random.Random(seed)
 
         # initialize map
         self.map = Map(map_path)
@@ -34,10 +39,15 @@ class Game:
         self.gs = GameState(self.map)
 
         # initialize players
+        # player threads are started on their first turn, sandboxed players get their process right away
+        self.workers = {}
         self.blue_failed_init = False
         try:
             blue_bot_name = os.path.basename(blue_path).split(".")[0]
-            self.blue_player: Player = import_file(blue_bot_name, blue_path).BotPlayer(copy.deepcopy(self.map))
+            if sandbox:
+                self.workers[Team.BLUE] = SandboxedPlayer(blue_path, Team.BLUE, self.gs)
+            else:
+                self.blue_player: Player = import_file(blue_bot_name, blue_path).BotPlayer(self.map)
         except:
             blue_bot_name = "blue"
             self.blue_failed_init = True
@@ -45,7 +55,10 @@ class Game:
         self.red_failed_init = False
         try:
             red_bot_name = os.path.basename(red_path).split(".")[0]
-            self.red_player: Player = import_file(red_bot_name, red_path).BotPlayer(copy.deepcopy(self.map))
+            if sandbox:
+                self.workers[Team.RED] = SandboxedPlayer(red_path, Team.RED, self.gs)
+            else:
+                self.red_player: Player = import_file(red_bot_name, red_path).BotPlayer(self.map)
         except:
             red_bot_name = "red"
             self.red_failed_init = True
@@ -60,8 +73,8 @@ class Game:
         )
 
         # initialize controllers
-        self.blue_controller = RobotController(Team.BLUE, self.gs)
-        self.red_controller = RobotController(Team.RED, self.gs)
+        self.blue_controller = RobotController(Team.BLUE, self.gs, blue_path)
+        self.red_controller = RobotController(Team.RED, self.gs, red_path)
         
     def run_turn(self):
         self.gs.start_turn()
@@ -88,13 +101,8 @@ class Game:
         self.gs.balance[Team.RED] += GameConstants.PASSIVE_INCOME
 
         # Decrement all debris/tower cooldowns
-        all_debris = list(self.gs.debris[Team.BLUE].values()) + list(self.gs.debris[Team.RED].values())
-        for debris in all_debris:
-            debris.current_cooldown = max(0, debris.current_cooldown - 1)
-        all_towers = list(self.gs.towers[Team.BLUE].values()) + list(self.gs.towers[Team.RED].values())
-        for tower in all_towers:
-            reduction = self.gs.get_tower_cooldown_reduction(tower.team, tower.id)
-            tower.current_cooldown = max(0, tower.current_cooldown - reduction)
+        self.gs.decrement_debris_cooldowns()
+        self.gs.decrement_tower_cooldowns()
 
         # Advance all debris
         self.gs.advance_debris()
@@ -108,12 +116,7 @@ class Game:
         self.gs.time_remaining[Team.RED] += GameConstants.ADDITIONAL_TIME_PER_TURN
 
         # Farms generate income
-        for team in [Team.BLUE, Team.RED]:
-            for tower in self.gs.towers[team].values():
-                if tower.type == TowerType.SOLAR_FARM:
-                    if tower.current_cooldown == 0:
-                        self.gs.balance[team] += GameConstants.FARM_INCOME
-                        tower.current_cooldown = TowerType.SOLAR_FARM.cooldown
+        self.gs.collect_farm_income()
 
         # Call each player's play_turn
         blue_success = self.call_player_code(Team.BLUE)
@@ -129,30 +132,58 @@ class Game:
         return None
     
     def call_player_code(self, team: Team):
-        player = self.blue_player if team == Team.BLUE else self.red_player
         controller = self.blue_controller if team == Team.BLUE else self.red_controller
 
-        # Create a thread that runs player.play_turn.
+        # Sleeping bots are not called, and are not charged any time
+        if not self.gs.should_wake(team):
+            return True
+
+        # Get the thread that runs player.play_turn.
         # This function might not exist if the player code is broken, so we need to handle that.
-        try:
-            thread = Thread(target=player.play_turn, args=[controller], daemon=True)
-        except:
-            print(f"Failed to call player code for {team}. Are you inheriting the Player class?")
-            return False
+        if team not in self.workers:
+            try:
+                player = self.blue_player if team == Team.BLUE else self.red_player
+                self.workers[team] = PlayerWorker(player)
+            except:
+                print(f"Failed to call player code for {team}. Are you inheriting the Player class?")
+                return False
 
         # Run in separate thread with time limit
-        funcTime = time.time()
-        thread.start()
-        thread.join(self.gs.time_remaining[team])
-        funcTime = time.time() - funcTime
+        funcTime = time.perf_counter()
+        finished = self.workers[team].call(controller, self.gs.time_remaining[team])
+        funcTime = time.perf_counter() - funcTime
 
         # Check if thread timed out
-        if thread.is_alive() or funcTime > self.gs.time_remaining[team]:
+        if not finished or funcTime > self.gs.time_remaining[team]:
             self.gs.time_remaining[team] = 0
             return False
         
         self.gs.time_remaining[team] -= funcTime
         return True
+
+    def run_precompute(self):
+        '''
+        Runs both players' precompute in parallel, each with precompute_time seconds, and hands the results back to them
+        '''
+        deadline = time.perf_counter() + self.precompute_time
+        # Functions that wait for each player's precompute to finish
+        pending = []
+        for team in Team:
+            if team in self.workers:
+                # Sandboxed players precompute in their own process
+                self.workers[team].start_precompute(self.precompute_time)
+                pending.append(self.workers[team].finish_precompute)
+                continue
+            player = self.blue_player if team == Team.BLUE else self.red_player
+            if overrides_precompute(player):
+                pending.append(Precompute(player, self.map).finish)
+        for finish in pending:
+            finish(deadline)
+
+    def close_workers(self):
+        for worker in self.workers.values():
+            worker.close()
+        self.workers = {}
     
     def calculate_winner(self):
         # Check if one team has more health than the other
@@ -174,24 +205,28 @@ class Game:
                 return Team.BLUE
         
         # Winner is decided by coin flip
-        return random.choice([Team.BLUE, Team.RED])
+        return self.random.choice([Team.BLUE, Team.RED])
     
     def run_game(self):
         # Check if we initialized successfully
         if self.blue_failed_init:
             print("Blue failed to initialize. Red wins.")
+            self.close_workers()
             return Team.RED
         elif self.red_failed_init:
             print("Red failed to initialize. Blue wins.")
+            self.close_workers()
             return Team.BLUE
 
         # Both players initialized successfully; we can start the game
+        self.run_precompute()
         while(True):
             if self.render:
                 self.gs.render()
             winner = self.run_turn()
             self.replay.add_turn(self.gs)
             if winner is not None:
+                self.close_workers()
                 self.replay.set_winner(winner)
                 if self.output_replay:
                     self.replay.write_json()
@@ -31,6 +31,7 @@ class GameConstants:
     REINFORCER_COOLDOWN_MULTIPLIER = 1.2
     INITIAL_TIME_POOL = 10 # in seconds
     ADDITIONAL_TIME_PER_TURN = 0.01
+    PRECOMPUTE_TIME = 5 # in seconds, separate from the time pool
 
 class SnipePriority(Enum):
     FIRST = 0
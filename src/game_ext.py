@@ -3,6 +3,7 @@
 
 import copy
 import importlib.util
+import inspect
 import random
 import sys
 import os
@@ -16,10 +17,25 @@ from src.replay import Replay
 from threading import Thread
 import time
 
+def player_file(player: Player):
+    '''
+    Returns the file player's class was loaded from, which owns its analysis cache entries, or None
+    for classes without one (e.g. defined in a REPL or notebook), which can't use the analysis cache
+    '''
+    try:
+        path = inspect.getfile(type(player))
+    except (OSError, TypeError):
+        return None
+    return path if os.path.isfile(path) else None
+
 class GameExt(Game):
-    def __init__(self, blue_player_name: str, blue_player: Player, red_player_name: str, red_player: Player, map_inst: Map, output_replay=False, render=False):
+    def __init__(self, blue_player_name: str, blue_player: Player, red_player_name: str, red_player: Player, map_inst: Map, output_replay=False, render=False, seed=None, precompute_time=GameConstants.PRECOMPUTE_TIME):
         self.output_replay = output_replay
         self.render = render
+        # Seconds each player's precompute may take before turn 1
+        self.precompute_time = precompute_time
+        # Only used to break exact ties, seeded so that results can be reproduced
+        self.random = random.Random(seed)
 
         # initialize map
         self.map = map_inst
@@ -43,5 +59,8 @@ class GameExt(Game):
         )
 
         # initialize controllers
-        self.blue_controller = RobotController(Team.BLUE, self.gs)
-        self.red_controller = RobotController(Team.RED, self.gs)
+        self.blue_controller = RobotController(Team.BLUE, self.gs, player_file(blue_player))
+        self.red_controller = RobotController(Team.RED, self.gs, player_file(red_player))
+
+        # player threads are started on their first turn
+        self.workers = {}
@@ -1,17 +1,52 @@
 from __future__ import annotations
 import math
+from dataclasses import dataclass
+import numpy as np
 
 import os
 os.environ['PYGAME_HIDE_SUPPORT_PROMPT'] = "hide"
 from src.game_constants import GameConstants, Team, Tile, TowerType
-from src.map import Map
-from src.debris import Debris
+from src.map import Map, disk_offsets
+from src.debris import DebrisStore
+from src.tower import CooldownClock, Tower
+
+REINFORCER_OFFSETS = disk_offsets(TowerType.REINFORCER.range)
+# Cooldown multiplier of a tower covered by n reinforcers, for every possible n
+COOLDOWN_MULTIPLIERS = [GameConstants.REINFORCER_COOLDOWN_MULTIPLIER**n for n in range(len(REINFORCER_OFFSETS) + 1)]
+# (type of cooldown, cooldown, reinforcers) -> result of cooldown_steps
+COOLDOWN_STEPS = {}
+
+def cooldown_steps(cooldown: float, reinforcers: int) -> tuple:
+    '''
+    Returns the values a tower's cooldown takes on successive turns, from cooldown down to 0,
+    when the tower is covered by the given number of reinforcers
+    '''
+    # 1 and 1.0 are equal as keys, but not as cooldowns
+    key = (type(cooldown), cooldown, reinforcers)
+    if key not in COOLDOWN_STEPS:
+        reduction = COOLDOWN_MULTIPLIERS[reinforcers]
+        steps = [cooldown]
+        while not (type(steps[-1]) == int and steps[-1] == 0):
+            steps.append(max(0, steps[-1] - reduction))
+        COOLDOWN_STEPS[key] = tuple(steps)
+    return COOLDOWN_STEPS[key]
+
+@dataclass
+class WakeCondition:
+    '''
+    Conditions under which a sleeping bot is called again, any one of them is enough
+    '''
+    turn: int = None
+    balance: float = None
+    debris_in_range: bool = False
+    # Enemy's tower_changes count when the bot went to sleep, None if not waiting on the enemy
+    enemy_tower_changes: int = None
 
 class GameState:
     def __init__(self, map: Map):
         self.map = map
         self.towers = {Team.BLUE: {}, Team.RED: {}}
-        self.debris = {Team.BLUE: {}, Team.RED: {}}
+        self.debris = {Team.BLUE: DebrisStore(Team.BLUE, map), Team.RED: DebrisStore(Team.RED, map)}
         self.time_remaining = {Team.BLUE: GameConstants.INITIAL_TIME_POOL, Team.RED: GameConstants.INITIAL_TIME_POOL}
         self.balance = {Team.BLUE: GameConstants.STARTING_BALANCE, Team.RED: GameConstants.STARTING_BALANCE}
         self.health = {Team.BLUE: GameConstants.STARTING_HEALTH, Team.RED: GameConstants.STARTING_HEALTH}
@@ -20,6 +55,40 @@ class GameState:
         self.turn = 0
         self.has_rendered = False
         self.sent_debris = {Team.BLUE: None, Team.RED: None}
+        # Bumped on every change to towers or debris, so readers can tell when cached snapshots are stale
+        self.generation = 0
+
+        # Id of the tower occupying each tile, or -1 if the tile is free
+        self.tower_grid = {
+            Team.BLUE: np.full((map.width, map.height), -1, dtype=np.int32),
+            Team.RED: np.full((map.width, map.height), -1, dtype=np.int32)
+        }
+        # Number of reinforcers in range of each tile
+        self.reinforcer_grid = {
+            Team.BLUE: np.zeros((map.width, map.height), dtype=np.int32),
+            Team.RED: np.zeros((map.width, map.height), dtype=np.int32)
+        }
+        # Number of gunships and bombers covering each path index
+        self.attack_coverage = {
+            Team.BLUE: np.zeros(map.path_length, dtype=np.int32),
+            Team.RED: np.zeros(map.path_length, dtype=np.int32)
+        }
+        # Number of towers each team has built or sold
+        self.tower_changes = {Team.BLUE: 0, Team.RED: 0}
+        self.wake_conditions = {Team.BLUE: None, Team.RED: None}
+        self.space_mask = map.mask(Tile.SPACE)
+        # Fill in the map's coverage grids before any bot's turn, so bots don't pay for them from their time pool
+        for tower_type in TowerType:
+            map.coverage(tower_type)
+
+        # Tower cooldowns are scheduled rather than counted down one tower at a time
+        self.cooldown_clock = CooldownClock()
+        # tick -> towers whose cooldown runs out on that tick. Entries for towers that were
+        # sold or had their cooldown rescheduled since are skipped.
+        self.cooldown_wheel = {Team.BLUE: {}, Team.RED: {}}
+        # Solar farms and gunships/bombers whose cooldown is 0, by id
+        self.ready_farms = {Team.BLUE: {}, Team.RED: {}}
+        self.ready_attackers = {Team.BLUE: {}, Team.RED: {}}
 
     def start_turn(self):
         self.current_snipes = {Team.BLUE: [], Team.RED: []}
@@ -27,17 +96,106 @@ class GameState:
         self.turn += 1
     
     def spawn_debris(self, team: Team, cooldown: int, health: int, sent_by_opponent: bool):
-        loc = self.map.path[0]
-        debris = Debris(team, loc[0], loc[1], cooldown, health, sent_by_opponent)
-        self.debris[team][debris.id] = debris
+        self.debris[team].spawn(cooldown, health, sent_by_opponent)
+        self.generation += 1
 
     def is_placeable(self, team: Team, x: int, y: int) -> bool:
         if not self.map.is_space(x, y):
             return False
-        for tower in self.towers[team].values():
-            if (tower.x, tower.y) == (x, y):
-                return False
-        return True
+        return self.tower_grid[team][x, y] < 0
+
+    def placeable_mask(self, team: Team) -> np.ndarray:
+        return self.space_mask & (self.tower_grid[team] < 0)
+
+    def build_tower(self, team: Team, tower_type: TowerType, x: int, y: int) -> Tower:
+        tower = Tower(team, tower_type, x, y)
+        self.add_tower(tower)
+        return tower
+
+    def add_tower(self, tower: Tower):
+        self.towers[tower.team][tower.id] = tower
+        self.tower_grid[tower.team][tower.x, tower.y] = tower.id
+        cooldown = tower.current_cooldown
+        tower.clock = self.cooldown_clock
+        self.schedule_cooldown(tower, cooldown)
+        if tower.type == TowerType.REINFORCER:
+            self.update_reinforcer_grid(tower.team, tower.x, tower.y, 1)
+        elif tower.type in (TowerType.GUNSHIP, TowerType.BOMBER):
+            self.attack_coverage[tower.team] += self.map.path_mask_in_range(tower.x, tower.y, tower.type.range)
+        self.tower_changes[tower.team] += 1
+        self.generation += 1
+
+    def sell_tower(self, team: Team, tower_id: int):
+        tower = self.towers[team].pop(tower_id)
+        self.tower_grid[team][tower.x, tower.y] = -1
+        self.ready_farms[team].pop(tower_id, None)
+        self.ready_attackers[team].pop(tower_id, None)
+        if tower.type == TowerType.REINFORCER:
+            self.update_reinforcer_grid(team, tower.x, tower.y, -1)
+        elif tower.type in (TowerType.GUNSHIP, TowerType.BOMBER):
+            self.attack_coverage[team] -= self.map.path_mask_in_range(tower.x, tower.y, tower.type.range)
+        self.tower_changes[team] += 1
+        self.generation += 1
+
+    def clear_towers(self, team: Team):
+        '''
+        Removes every tower of the team, along with everything derived from them
+        '''
+        self.towers[team] = {}
+        self.tower_grid[team].fill(-1)
+        self.reinforcer_grid[team].fill(0)
+        self.attack_coverage[team].fill(0)
+        self.cooldown_wheel[team] = {}
+        self.ready_farms[team] = {}
+        self.ready_attackers[team] = {}
+        self.generation += 1
+
+    def start_tower_cooldown(self, tower: Tower, cooldown: int):
+        self.schedule_cooldown(tower, cooldown)
+        self.generation += 1
+
+    def schedule_cooldown(self, tower: Tower, cooldown: float):
+        '''
+        Sets the tower's cooldown, working out the values it will take on the following turns
+        and the turn on which it runs out
+        '''
+        team = tower.team
+        steps = cooldown_steps(cooldown, int(self.reinforcer_grid[team][tower.x, tower.y]))
+        tower.cooldown_steps = steps
+        tower.cooldown_since = self.cooldown_clock.tick
+
+        ready = self.ready_towers(tower)
+        if ready is None:
+            return
+        if steps[0] == 0:
+            ready[tower.id] = tower
+        else:
+            ready.pop(tower.id, None)
+            ready_tick = tower.cooldown_since + steps.index(0)
+            self.cooldown_wheel[team].setdefault(ready_tick, []).append(tower)
+
+    def ready_towers(self, tower: Tower) -> dict:
+        '''
+        Returns the dict of ready towers the tower belongs in when its cooldown is 0, or None if it isn't tracked
+        '''
+        if tower.type == TowerType.SOLAR_FARM:
+            return self.ready_farms[tower.team]
+        elif tower.type in (TowerType.GUNSHIP, TowerType.BOMBER):
+            return self.ready_attackers[tower.team]
+        return None
+
+    def update_reinforcer_grid(self, team: Team, x: int, y: int, delta: int):
+        grid = self.reinforcer_grid[team]
+        towers = self.towers[team]
+        tower_grid = self.tower_grid[team]
+        for (dx, dy) in REINFORCER_OFFSETS:
+            if self.map.is_in_bounds(x + dx, y + dy):
+                grid[x + dx, y + dy] += delta
+                # The rest of a covered tower's cooldown now runs down at a different rate
+                tower_id = int(tower_grid[x + dx, y + dy])
+                if tower_id >= 0:
+                    tower = towers[tower_id]
+                    self.schedule_cooldown(tower, tower.current_cooldown)
     
     def damage_debris(self, debris_id: int, damage: int):
         team = None
@@ -48,39 +206,69 @@ class GameState:
         if team is None:
             raise Exception("Bug in game engine. Tried to damage non-existent debris.")
         
-        self.debris[team][debris_id].health -= damage
-        if self.debris[team][debris_id].health <= 0:
-            del self.debris[team][debris_id]
+        self.damage_debris_rows(team, [self.debris[team].row_of(debris_id)], damage)
+
+    def damage_debris_rows(self, team: Team, rows, damage: int):
+        '''
+        Damages the debris in the given rows of the team's DebrisStore, removing any left with no health
+        '''
+        self.debris[team].damage(rows, damage)
+        self.generation += 1
     
+    def decrement_debris_cooldowns(self):
+        for team in Team:
+            self.debris[team].decrement_cooldowns()
+        self.generation += 1
+
     def advance_debris(self):
+        self.generation += 1
         for team in Team:
-            to_remove = []
-            for debris in self.debris[team].values():
-                if debris.current_cooldown > 0:
-                    continue
-                else:
-                    debris.current_cooldown = debris.total_cooldown
-                    debris.progress += 1
-                    if debris.progress == len(self.map.path):
-                        to_remove.append(debris.id)
-                        self.health[team] -= debris.total_health
-                        self.health[team] = max(0, self.health[team])
-                    else:
-                        debris.x, debris.y = self.map.path[debris.progress]
-            for id in to_remove:
-                del self.debris[team][id]
+            for total_health in self.debris[team].advance():
+                self.health[team] -= total_health
+                self.health[team] = max(0, self.health[team])
     
+    def any_debris_in_attack_range(self, team: Team) -> bool:
+        store = self.debris[team]
+        return bool(self.attack_coverage[team][store.progress[:store.size]].any())
+
+    def should_wake(self, team: Team) -> bool:
+        '''
+        Returns whether the team's bot should be called this turn, clearing its wake condition if one fired
+        '''
+        condition = self.wake_conditions[team]
+        if condition is None:
+            return True
+        enemy = Team.RED if team == Team.BLUE else Team.BLUE
+        if ((condition.turn is not None and self.turn >= condition.turn)
+            or (condition.balance is not None and self.balance[team] >= condition.balance)
+            or (condition.debris_in_range and self.any_debris_in_attack_range(team))
+            or (condition.enemy_tower_changes is not None and self.tower_changes[enemy] != condition.enemy_tower_changes)):
+            self.wake_conditions[team] = None
+            return True
+        return False
+
     def get_tower_cooldown_reduction(self, team: Team, tower_id: int) -> float:
-        this_tower = self.towers[team][tower_id]
-
-        num_reinforcers = 0
-        for tower in self.towers[team].values():
-            if tower.type == TowerType.REINFORCER:
-                dist = (tower.x - this_tower.x)**2 + (tower.y - this_tower.y)**2
-                if dist <= TowerType.REINFORCER.range:
-                    num_reinforcers += 1
-        
-        return GameConstants.REINFORCER_COOLDOWN_MULTIPLIER**num_reinforcers
+        tower = self.towers[team][tower_id]
+        return COOLDOWN_MULTIPLIERS[self.reinforcer_grid[team][tower.x, tower.y]]
+
+    def decrement_tower_cooldowns(self):
+        # Every cooldown follows its scheduled steps, so only the towers whose cooldown runs out are touched
+        self.generation += 1
+        self.cooldown_clock.tick += 1
+        for team in Team:
+            for tower in self.cooldown_wheel[team].pop(self.cooldown_clock.tick, []):
+                if tower.current_cooldown == 0 and self.towers[team].get(tower.id) is tower:
+                    self.ready_towers(tower)[tower.id] = tower
+
+    def collect_farm_income(self):
+        '''
+        Pays FARM_INCOME for every solar farm whose cooldown has run out, in id order, and restarts their cooldowns
+        '''
+        for team in Team:
+            ready = self.ready_farms[team]
+            for tower_id in sorted(ready):
+                self.balance[team] += GameConstants.FARM_INCOME
+                self.start_tower_cooldown(ready[tower_id], TowerType.SOLAR_FARM.cooldown)
 
     def render(self):
         import pygame
@@ -110,9 +298,9 @@ class GameState:
         asteroid_color = (128, 128, 128)
         for x in range(self.map.width):
             for y in range(self.map.height):
-                if self.map.tiles[x][y] == Tile.SPACE:
+                if self.map.is_space(x, y):
                     color = space_color
-                elif self.map.tiles[x][y] == Tile.PATH:
+                elif self.map.is_path(x, y):
                     color = path_color
                 else:
                     color = asteroid_color
@@ -147,24 +335,17 @@ class GameState:
                 
         
         # Draw debris as text indicating number of debris on that tile
-        counts = {}
-        counts[Team.BLUE] = [[0 for y in range(self.map.height)] for x in range(self.map.width)]
-        counts[Team.RED] = [[0 for y in range(self.map.height)] for x in range(self.map.width)]
         for team in [Team.BLUE, Team.RED]:
-            for deb in self.debris[team].values():
-                x = deb.x
-                y = deb.y
-                counts[team][x][y] += 1
-        for team in [Team.BLUE, Team.RED]:
-            for x in range(self.map.width):
-                for y in range(self.map.height):
-                    if counts[team][x][y] == 0:
-                        continue
-                    text = font.SysFont('Comic Sans MS', 10).render(str(counts[team][x][y]), True, (255, 255, 255))
-                    ((left, top), (width, height)) = get_screen_coords(team, x, y)
-                    center = (left + width/2, top + height/2)
-                    text_rect = text.get_rect(center=center)
-                    self.screen.blit(text, text_rect)
+            counts = {}
+            occupancy = self.debris[team].path_occupancy()
+            for i in np.flatnonzero(occupancy).tolist():
+                counts[self.map.path[i]] = counts.get(self.map.path[i], 0) + int(occupancy[i])
+            for ((x, y), count) in counts.items():
+                text = font.SysFont('Comic Sans MS', 10).render(str(count), True, (255, 255, 255))
+                ((left, top), (width, height)) = get_screen_coords(team, x, y)
+                center = (left + width/2, top + height/2)
+                text_rect = text.get_rect(center=center)
+                self.screen.blit(text, text_rect)
         
         # Draw line separating blue and red sides
         pygame.draw.line(
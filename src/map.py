@@ -1,49 +1,284 @@
-from src.game_constants import Tile
+from src.game_constants import Tile, TowerType
 import os
+import math
+import hashlib
+import json
+import struct
 import src.map_processor as map_processor
 import ast
+from types import MappingProxyType
+import numpy as np
+
+# Layout of a compiled map file: this header, then tiles (uint8, width x height),
+# path (int32, path_length x 2) and path_index (int32, width x height).
+# Bump COMPILED_FORMAT whenever the layout or what compile_map produces changes,
+# so files written by older code are rebuilt instead of loaded.
+COMPILED_MAGIC = b"AWAPMAP"
+COMPILED_FORMAT = 1
+COMPILED_HEADER = struct.Struct("<7sB20sIII")
+TILES = list(Tile)
+SPACE, PATH, ASTEROID = Tile.SPACE.value, Tile.PATH.value, Tile.ASTEROID.value
+# Tile masks are padded by this many tiles on every side, enough to hold the range of any tower
+# on the map, so windows around a tile can be sliced out without clipping them to the map
+MASK_PADDING = max(math.isqrt(tower_type.range) for tower_type in TowerType)
+# Only ranges around a tile a tower could stand on, with a tower's radius, are cached. That is
+# every range the engine asks for, and keeps the caches bounded by the size of the map whatever
+# bots query.
+TOWER_RANGES = frozenset(tower_type.range for tower_type in TowerType)
+
+def disk_offsets(r2: int) -> list:
+    '''
+    Returns every (dx, dy) with dx**2 + dy**2 <= r2, including (0, 0)
+    '''
+    r = int(r2**0.5)
+    return [(dx, dy) for dx in range(-r, r+1) for dy in range(-r, r+1) if dx**2 + dy**2 <= r2]
+
+def compiled_map_path(fname: str) -> str:
+    return fname + ".compiled"
+
+def compile_map(source: str) -> dict:
+    '''
+    Parses the text of a .awap24m file into the arrays a Map is built from:
+    tiles[x][y] (Tile values), path[i] = (x, y) in order, and path_index[x][y] (-1 off the path)
+    '''
+    line = source.split('\n', 1)[0]
+    try:
+        # Map files are written as JSON, which parses far faster than a Python literal on large maps
+        arr = json.loads(line)
+    except ValueError:
+        arr = ast.literal_eval(line)
+    height = len(arr)
+    width = len(arr[0])
+
+    # The text is indexed [row][column] with row 0 at the top, a Map is indexed [x][y] with y = 0 at the bottom
+    def to_xy(grid: np.ndarray) -> np.ndarray:
+        return np.ascontiguousarray(grid[::-1].T)
+
+    rc_path, rc_index = map_processor.tracePaths(map_processor.pathMask(arr))
+    path = np.stack([rc_path[:, 1], height-1-rc_path[:, 0]], axis=1) # swap xs and ys
+    path_index = to_xy(rc_index)
+
+    tiles = np.full((width, height), Tile.SPACE.value, dtype=np.uint8)
+    tiles[path[:, 0], path[:, 1]] = Tile.PATH.value
+    asteroids = np.array([[cell[0] == 'R' for cell in row] for row in arr], dtype=bool).reshape(height, width)
+    tiles[to_xy(asteroids)] = Tile.ASTEROID.value
+    return {"tiles": tiles, "path": path, "path_index": path_index}
+
+def load_compiled_map(fname: str, source_hash: bytes):
+    '''
+    Returns the arrays compiled from fname, or None if they have not been saved yet or were
+    compiled from a different source or by a different version of compile_map
+    '''
+    try:
+        with open(compiled_map_path(fname), 'rb') as f:
+            data = f.read()
+        magic, format, hash, width, height, path_length = COMPILED_HEADER.unpack_from(data)
+    except (OSError, struct.error):
+        return None
+    if magic != COMPILED_MAGIC or format != COMPILED_FORMAT or hash != source_hash:
+        return None
+    offset = COMPILED_HEADER.size
+    def read(dtype, shape):
+        nonlocal offset
+        array = np.frombuffer(data, dtype=dtype, count=int(np.prod(shape)), offset=offset).reshape(shape)
+        offset += array.nbytes
+        return array
+    try:
+        return {
+            "tiles": read(np.uint8, (width, height)),
+            "path": read(np.int32, (path_length, 2)),
+            "path_index": read(np.int32, (width, height))
+        }
+    except ValueError:
+        # Truncated file
+        return None
+
+def save_compiled_map(fname: str, source_hash: bytes, compiled: dict):
+    width, height = compiled["tiles"].shape
+    header = COMPILED_HEADER.pack(COMPILED_MAGIC, COMPILED_FORMAT, source_hash, width, height, len(compiled["path"]))
+    path = compiled_map_path(fname)
+    # Write then rename, so a concurrent or interrupted run never sees a partial file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(header)
+            f.write(compiled["tiles"].astype(np.uint8).tobytes())
+            f.write(compiled["path"].astype(np.int32).tobytes())
+            f.write(compiled["path_index"].astype(np.int32).tobytes())
+        os.replace(tmp_path, path)
+    except OSError:
+        # The maps directory may be read-only, in which case the map is compiled every time
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def freeze(value):
+    '''
+    Makes every array in value read-only, looking inside tuples, lists and dicts. Returns value.
+    '''
+    if isinstance(value, np.ndarray):
+        value.setflags(write=False)
+    elif isinstance(value, (tuple, list)):
+        for item in value:
+            freeze(item)
+    elif isinstance(value, dict):
+        for item in value.values():
+            freeze(item)
+    return value
 
 class Map:
+    '''
+    A map is immutable once loaded, so one instance is shared by the game, both bots and every
+    game played on it in a process. Setting an attribute or writing into one of its arrays raises.
+    The path_ranges, path_distances and coverages caches are filled in as they are queried, with read-only arrays,
+    and are exposed as read-only mappings so that a bot can't change what the engine reads from them.
+    '''
     def __init__(self, fname: str):
         self.name = os.path.basename(fname).split('.')[0]
-        with open(fname, 'r') as f:
-            arrAsStr = f.readline()
+        with open(fname, 'rb') as f:
+            source = f.read()
 
-        self.arr = ast.literal_eval(arrAsStr)
-        self.height = len(self.arr)
-        self.width = len(self.arr[0])
-
-        self.path = map_processor.get_path(fname)
-        for i in range(len(self.path)):
-            self.path[i] = (self.path[i][1], self.height-1-self.path[i][0]) # swap xs and ys
+        source_hash = hashlib.sha1(source).digest()
+        # Identifies the map by its contents, whatever file it was loaded from
+        self.content_hash = source_hash.hex()
+        compiled = load_compiled_map(fname, source_hash)
+        if compiled is None:
+            compiled = compile_map(source.decode())
+            save_compiled_map(fname, source_hash, compiled)
 
+        self.width, self.height = compiled["tiles"].shape
+        self.path_x = compiled["path"][:, 0].astype(np.int64)
+        self.path_y = compiled["path"][:, 1].astype(np.int64)
+        self.path = tuple(zip(self.path_x.tolist(), self.path_y.tolist()))
         self.path_length = len(self.path)
-        
-        self.tiles = [[Tile.SPACE for y in range(self.height)] for x in range(self.width)]
-        for i in range(self.path_length):
-            x, y = self.path[i]
-            self.tiles[x][y] = Tile.PATH
-
-        for x in range(self.width):
-            for y in range(self.height):
-                if self.arr[y][x][0] == 'R':
-                    self.tiles[x][self.height-1-y] = Tile.ASTEROID
-    
+        # path_index[x][y] is the index into path of the path tile at (x, y), or -1
+        self.path_index = compiled["path_index"]
+        # (x, y, r2) -> path indices within r2 of (x, y), filled in as ranges are queried (see is_cached_range)
+        self._path_ranges = {}
+        # (x, y, r2) -> result of path_indices_by_distance
+        self._path_distances = {}
+        # TowerType -> result of coverage
+        self._coverages = {}
+
+        # grid[x][y] is the Tile value at (x, y)
+        self.grid = compiled["tiles"]
+        self.grid_values = tuple(tuple(column) for column in self.grid.tolist())
+        self.tiles = tuple(tuple(TILES[value] for value in column) for column in self.grid_values)
+        # Tile -> boolean mask over the map padded by MASK_PADDING tiles, which are False in every mask
+        self._padded_masks = MappingProxyType({tile: np.pad(self.grid == tile.value, MASK_PADDING) for tile in Tile})
+        freeze(vars(self))
+        freeze(dict(self._padded_masks))
+        self._expose_caches()
+        self._frozen = True
+
+    def _expose_caches(self):
+        # Read-only views of the caches, which the map itself keeps filling in
+        vars(self).update(
+            path_ranges=MappingProxyType(self._path_ranges),
+            path_distances=MappingProxyType(self._path_distances),
+            coverages=MappingProxyType(self._coverages)
+        )
+
+    def __setattr__(self, name: str, value):
+        if getattr(self, "_frozen", False):
+            raise AttributeError(f"Map is immutable, cannot set {name}")
+        object.__setattr__(self, name, value)
+
+    def __delattr__(self, name: str):
+        raise AttributeError(f"Map is immutable, cannot delete {name}")
+
+    def __copy__(self) -> "Map":
+        return self
+
+    def __deepcopy__(self, memo: dict) -> "Map":
+        return self
+
+    def __getstate__(self) -> dict:
+        # Mapping proxies can't be pickled, so the views are rebuilt by __setstate__
+        state = {name: value for (name, value) in vars(self).items() if name not in ("path_ranges", "path_distances", "coverages")}
+        state["_padded_masks"] = dict(self._padded_masks)
+        return state
+
+    def __setstate__(self, state: dict):
+        # Arrays come out of a pickle writable, e.g. in a sandbox process
+        freeze(state)
+        state["_padded_masks"] = MappingProxyType(state["_padded_masks"])
+        vars(self).update(state)
+        self._expose_caches()
+
+    def mask(self, tile: Tile, padded: bool = False) -> np.ndarray:
+        '''
+        Returns a boolean array indexed [x][y] that is True on tiles of the given type.
+        If padded, the array has MASK_PADDING extra tiles on every side, so mask[x + MASK_PADDING][y + MASK_PADDING] is (x, y).
+        '''
+        if padded:
+            return self._padded_masks[tile]
+        return self._padded_masks[tile][MASK_PADDING:MASK_PADDING + self.width, MASK_PADDING:MASK_PADDING + self.height]
+
+    def coverage(self, tower_type: TowerType) -> np.ndarray:
+        '''
+        Returns an int array indexed [x][y] holding the number of path tiles within range of a tower
+        of tower_type at (x, y), or 0 where no tower can be placed
+        '''
+        if tower_type not in self._coverages:
+            # Sum the path mask shifted by every offset within range, i.e. convolve it with a disk
+            path = self.mask(Tile.PATH, padded=True)
+            counts = np.zeros((self.width, self.height), dtype=int)
+            for (dx, dy) in disk_offsets(tower_type.range):
+                counts += path[MASK_PADDING + dx:MASK_PADDING + dx + self.width, MASK_PADDING + dy:MASK_PADDING + dy + self.height]
+            counts[~self.mask(Tile.SPACE)] = 0
+            self._coverages[tower_type] = freeze(counts)
+        return self._coverages[tower_type]
+
     def is_in_bounds(self, x: int, y: int) -> bool:
         return 0 <= x < self.width and 0 <= y < self.height
 
     def is_space(self, x: int, y: int) -> bool:
-        if not self.is_in_bounds(x, y):
-            return False
-        return self.tiles[x][y] == Tile.SPACE
-    
+        return 0 <= x < self.width and 0 <= y < self.height and self.grid_values[x][y] == SPACE
+
     def is_asteroid(self, x: int, y: int) -> bool:
-        if not self.is_in_bounds(x, y):
-            return False
-        return self.tiles[x][y] == Tile.ASTEROID
-    
+        return 0 <= x < self.width and 0 <= y < self.height and self.grid_values[x][y] == ASTEROID
+
     def is_path(self, x: int, y: int) -> bool:
-        if not self.is_in_bounds(x, y):
-            return False
-        return self.tiles[x][y] == Tile.PATH
- 
\ No newline at end of file
+        return 0 <= x < self.width and 0 <= y < self.height and self.grid_values[x][y] == PATH
+
+
+    def path_indices_in_range(self, x: int, y: int, r2: int) -> np.ndarray:
+        '''
+        Returns the sorted indices into path of every path tile within r2 of (x, y)
+        '''
+        return self.path_range(x, y, r2)[0]
+
+    def path_mask_in_range(self, x: int, y: int, r2: int) -> np.ndarray:
+        '''
+        Returns a boolean array over path indices that is True for path tiles within r2 of (x, y)
+        '''
+        return self.path_range(x, y, r2)[1]
+
+    def is_cached_range(self, x: int, y: int, r2: int) -> bool:
+        return r2 in TOWER_RANGES and self.is_space(x, y)
+
+    def path_range(self, x: int, y: int, r2: int) -> tuple:
+        key = (x, y, r2)
+        if key in self._path_ranges:
+            return self._path_ranges[key]
+        mask = (self.path_x - x)**2 + (self.path_y - y)**2 <= r2
+        result = freeze((np.flatnonzero(mask), mask))
+        if self.is_cached_range(x, y, r2):
+            self._path_ranges[key] = result
+        return result
+
+    def path_indices_by_distance(self, x: int, y: int, r2: int) -> tuple:
+        '''
+        Returns (indices, distances): the indices into path of every path tile within r2 of (x, y),
+        sorted by squared distance to (x, y) and then by index, and those squared distances
+        '''
+        key = (x, y, r2)
+        if key in self._path_distances:
+            return self._path_distances[key]
+        indices = self.path_indices_in_range(x, y, r2)
+        distances = (self.path_x[indices] - x)**2 + (self.path_y[indices] - y)**2
+        order = np.argsort(distances, kind="stable")
+        result = freeze((indices[order], distances[order]))
+        if self.is_cached_range(x, y, r2):
+            self._path_distances[key] = result
+        return result
@@ -1,72 +1,88 @@
+import numpy as np
+
 def print2DArr (bools):
     for i in range(len(bools)):
         for j in range(len(bools[0])):
             print(bools[i][j], ' ')
         print('\n')
 
+# boolean grid that is True where arr has a path tile
+def pathMask (arr):
+    return np.array([[cell[0] == 'P' for cell in row] for row in arr], dtype=bool).reshape(len(arr), -1)
+
 # true if x, y is a valid start / end point (e.g. only has one path block touching it)
-def isPoint (arr, x, y, n, m):
+def isPoint (mask, x, y, n, m):
     numSurrounding = 0
-    if (x-1 > 0 and arr[x-1][y][0] == 'P'):
+    if (x-1 > 0 and mask[x-1][y]):
         numSurrounding+=1
-    if (y-1 > 0 and arr[x][y-1][0] == 'P'):
+    if (y-1 > 0 and mask[x][y-1]):
         numSurrounding+=1
-    if (x+1 < n and arr[x+1][y][0] == 'P'):
+    if (x+1 < n and mask[x+1][y]):
         numSurrounding+=1
-    if (y+1 < m and arr[x][y+1][0] == 'P'):
+    if (y+1 < m and mask[x][y+1]):
         numSurrounding+=1
 
-    return (arr[x][y][0] == 'P' and numSurrounding == 1)
+    return (mask[x][y] and numSurrounding == 1)
 
 # checks the top, bottom, left, and right edge of the map for a "point" piece
-def findStart (arr, n, m):
+def findStart (mask, n, m):
     for i in range(n):
-        if isPoint(arr, i, 0, n, m):
+        if isPoint(mask, i, 0, n, m):
             return [i, 0]
-        elif isPoint(arr, i, m-1, n, m):
+        elif isPoint(mask, i, m-1, n, m):
             return [i, m-1]
     for j in range(m):
-        if isPoint(arr, 0, j, n, m):
+        if isPoint(mask, 0, j, n, m):
             return [0, j]
-        if isPoint(arr, n-1, j, n, m):
+        if isPoint(mask, n-1, j, n, m):
             return [n-1, j]
     return [-1, -1]
 
 # generates a list of all "point" pieces as defined above
-def getPoints (arr, n, m):
+def getPoints (mask, n, m):
     points = []
     for i in range(n):
-        if isPoint(arr, i, 0, n, m):
+        if isPoint(mask, i, 0, n, m):
             points.append([i, 0])
-        elif isPoint(arr, i, m-1, n, m):
+        elif isPoint(mask, i, m-1, n, m):
             points.append([i, m-1])
     for j in range(m):
-        if isPoint(arr, 0, j, n, m):
+        if isPoint(mask, 0, j, n, m):
             points.append([0, j])
-        if isPoint(arr, n-1, j, n, m):
+        if isPoint(mask, n-1, j, n, m):
             points.append([n-1, j])
     return points
 
-# modifies path list to contain in-order coordinates of balloon path location, starting from r, c
-def floodFill (arr, bools, r, c, n, m, path): 
-    # out of bounds
-    if r < 0 or r >= n or c < 0 or c >= m:
-        return False
-    # already seen
-    if bools[r][c]:
-        return False
-    # valid path
-    if arr[r][c][0] == 'P':
-        path.append([r, c])
-        bools[r][c] = True
-    # not a path
-    else:
-        return False
-    
-    floodFill(arr, bools, r+1, c, n, m, path)
-    floodFill(arr, bools, r, c-1, n, m, path)
-    floodFill(arr, bools, r-1, c, n, m, path)
-    floodFill(arr, bools, r, c+1, n, m, path)
+# finds every path in one pass, starting from each "point" piece that is not on an earlier path.
+# tiles are visited depth first, trying down, left, up, then right (in arr coordinates) from each tile.
+# returns (path, index): path[i] = [r, c] of the i-th path tile, index[r][c] = i, or -1 off the path
+def tracePaths (mask):
+    n, m = mask.shape
+    # flat copy of mask with a border of False, so neighbours never need bounds checks
+    width = m + 2
+    padded = np.pad(mask, 1).ravel().tolist()
+    seen = [False] * len(padded)
+    # reversed, since the last neighbour pushed is the first one visited
+    steps = [1, -width, -1, width]
+
+    order = []
+    for (r, c) in getPoints(mask, n, m):
+        stack = [(r + 1) * width + c + 1]
+        while stack:
+            tile = stack.pop()
+            if seen[tile]:
+                continue
+            seen[tile] = True
+            order.append(tile)
+            for step in steps:
+                if padded[tile + step] and not seen[tile + step]:
+                    stack.append(tile + step)
+
+    order = np.array(order, dtype=np.int64)
+    path = np.stack([order // width - 1, order % width - 1], axis=1)
+    index = np.full((n, m), -1, dtype=np.int32)
+    index[path[:, 0], path[:, 1]] = np.arange(len(path))
+    return path, index
 
 def get_path(fname):
     import ast
@@ -74,17 +90,4 @@ def get_path(fname):
     arrAsStr = file.readline()
     file.close()
 
-    arr = ast.literal_eval(arrAsStr)
-    n = len(arr)
-    m = len(arr[0])
-    bools = [[False for i in range(m)] for j in range(n)]
-
-    points = getPoints(arr, n, m)
-
-    path = []
-    for corr in points :
-        if(corr not in path):
-            currPath = []
-            floodFill(arr, bools, corr[0], corr[1], n, m, currPath)
-            path.extend(currPath)
-    return path
+    return tracePaths(pathMask(ast.literal_eval(arrAsStr)))[0].tolist()
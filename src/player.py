@@ -8,5 +8,21 @@ class Player:
     def __init__(self, map: Map):
         pass
 
+    def precompute(self, map: Map):
+        '''
+        Optional. Called once before turn 1 with its own time budget (GameConstants.PRECOMPUTE_TIME seconds),
+        which is not taken from the time pool. Both players precompute in parallel, each in a separate forked process,
+        so changes made to the player here are lost: return what should be kept instead. Without fork (Windows)
+        it runs in a thread that can't be stopped if it overruns, so it keeps competing with the game for the CPU.
+        The return value is passed to receive_precomputed if precompute finishes within its budget.
+        '''
+        return None
+
+    def receive_precomputed(self, result):
+        '''
+        Called with the value precompute returned, before turn 1
+        '''
+        pass
+
     def play_turn(self, rc: RobotController):
         raise NotImplementedError()
\ No newline at end of file
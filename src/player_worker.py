@@ -0,0 +1,59 @@
+import threading
+import traceback
+from src.player import Player
+from src.robot_controller import RobotController
+
+class PlayerWorker:
+    '''
+    Long-lived daemon thread that runs one player's play_turn each time call() is made,
+    so the game doesn't have to start a new thread per player per turn.
+    '''
+    def __init__(self, player: Player):
+        # Raises if the player code is broken and has no play_turn
+        self.play_turn = player.play_turn
+        self.condition = threading.Condition()
+        self.controller = None
+        self.busy = False
+        self.closed = False
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def run(self):
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.controller is not None or self.closed)
+                if self.closed:
+                    return
+                controller = self.controller
+                self.controller = None
+
+            try:
+                self.play_turn(controller)
+            except SystemExit:
+                pass
+            except Exception:
+                # Same as an uncaught exception in a per-turn thread: report it and carry on
+                traceback.print_exc()
+
+            with self.condition:
+                self.busy = False
+                self.condition.notify_all()
+
+    def call(self, controller: RobotController, timeout: float) -> bool:
+        '''
+        Runs play_turn(controller) on the worker thread.
+        Returns False if it did not finish within timeout seconds.
+        '''
+        with self.condition:
+            self.controller = controller
+            self.busy = True
+            self.condition.notify_all()
+            return self.condition.wait_for(lambda: not self.busy, max(0, timeout))
+
+    def close(self):
+        '''
+        Lets the thread exit once it is idle. A worker stuck in a timed out turn is left behind as a daemon.
+        '''
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
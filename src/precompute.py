@@ -0,0 +1,102 @@
+# Runs Player.precompute before turn 1. Each player gets its own forked child process, so both
+# players precompute in parallel and a player that overruns its budget is killed. The child is
+# forked directly rather than through multiprocessing, which refuses to start children from
+# daemonic processes such as arena workers and sandboxes.
+#
+# Where fork is unavailable (e.g. Windows) precompute runs in a thread instead. Python can't stop a
+# thread, so one that overruns is abandoned but keeps running, and competes for the CPU with both
+# bots' turns until it returns or the game ends.
+
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+
+from src.map import Map
+from src.player import Player
+
+def overrides_precompute(player: Player) -> bool:
+    # Players that don't inherit from Player have nothing to precompute
+    return getattr(type(player), "precompute", Player.precompute) is not Player.precompute
+
+def run_precompute(player: Player, map: Map, conn):
+    '''
+    Entry point of the precompute process
+    '''
+    try:
+        conn.send(("ok", player.precompute(map)))
+    except Exception:
+        # Includes results that can't be pickled
+        traceback.print_exc()
+        conn.send(("error", None))
+
+class Precompute:
+    '''
+    Runs player.precompute(map) in the background. finish() waits for it and hands the result to
+    player.receive_precomputed.
+    '''
+    def __init__(self, player: Player, map: Map):
+        self.player = player
+        self.result = None
+        self.pid = None
+        self.thread = None
+        if not hasattr(os, "fork"):
+            self.thread = threading.Thread(target=self.run_in_thread, args=(map,), daemon=True)
+            self.thread.start()
+            return
+        self.conn, child_conn = multiprocessing.Pipe(duplex=False)
+        # Anything still buffered would otherwise be written by both processes
+        sys.stdout.flush()
+        sys.stderr.flush()
+        self.pid = os.fork()
+        if self.pid == 0:
+            # Never return into the game from the child, whatever precompute does
+            try:
+                self.conn.close()
+                run_precompute(player, map, child_conn)
+            finally:
+                sys.stdout.flush()
+                sys.stderr.flush()
+                os._exit(0)
+        child_conn.close()
+
+    def run_in_thread(self, map: Map):
+        try:
+            self.result = ("ok", self.player.precompute(map))
+        except Exception:
+            traceback.print_exc()
+            self.result = ("error", None)
+
+    def finish(self, deadline: float) -> bool:
+        '''
+        Waits until deadline (a time.perf_counter() value) for precompute to return.
+        Returns whether it returned in time, in which case its result has been handed to the player.
+        '''
+        remaining = max(0, deadline - time.perf_counter())
+        if self.thread is not None:
+            self.thread.join(remaining)
+            result = None if self.thread.is_alive() else self.result
+        else:
+            result = None
+            try:
+                if self.conn.poll(remaining):
+                    result = self.conn.recv()
+            except EOFError:
+                # The process died
+                pass
+            # Killing a process that has already exited (but not been waited for) does nothing
+            os.kill(self.pid, signal.SIGKILL)
+            os.waitpid(self.pid, 0)
+            self.conn.close()
+
+        if result is None:
+            print(f"{type(self.player).__name__}.precompute did not finish within its time budget")
+            return False
+        status, value = result
+        if status != "ok":
+            return False
+        self.player.receive_precomputed(value)
+        return True
@@ -1,17 +1,24 @@
-import copy
 from typing import List
 import math
+import numpy as np
 
+from src.analysis_cache import AnalysisCache
 from src.debris import Debris
 from src.game_exception import GameException
 from src.game_constants import SnipePriority, Team, TowerType, GameConstants
-from src.game_state import GameState
-from src.tower import Tower
+from src.game_state import GameState, WakeCondition
+from src.map import Map
+from src.tower import TowerSnapshot
 
 class RobotController:
-    def __init__(self, team: Team, game_state: GameState):
+    def __init__(self, team: Team, game_state: GameState, bot_path: str = None):
         self.__team = team
         self.__gs = game_state
+        # File of the bot this controller is handed to, which owns its analysis cache entries
+        self.__bot_path = bot_path
+        # (kind, team) -> ((turn, generation), snapshots) for the latest get_towers/get_debris result
+        self.__snapshots = {}
+        self.__analysis_cache = None
     
     def get_ally_team(self) -> Team:
         return self.__team
@@ -22,22 +29,45 @@ class RobotController:
         else:
             return Team.BLUE
     
-    def get_map(self) -> list:
-        return copy.deepcopy(self.__gs.map)
+    def get_map(self) -> Map:
+        # Maps are immutable, so the game's own map can be handed out
+        return self.__gs.map
     
-    def get_towers(self, team: Team) -> List[Tower]:
-        return copy.deepcopy(list(self.__gs.towers[team].values()))
+    def get_analysis_cache(self) -> AnalysisCache:
+        '''
+        Returns a cache of arrays computed from the map, kept on disk between games on the same map
+        '''
+        if self.__bot_path is None:
+            raise GameException("get_analysis_cache(): the bot's file is not known")
+        if self.__analysis_cache is None:
+            self.__analysis_cache = AnalysisCache(self.__gs.map, self.__bot_path)
+        return self.__analysis_cache
+
+    def get_towers(self, team: Team) -> List[TowerSnapshot]:
+        return self.__cached_snapshots("towers", team, lambda: [tower.snapshot() for tower in self.__gs.towers[team].values()])
     
     def get_debris(self, team: Team) -> List[Debris]:
-        return copy.deepcopy(list(self.__gs.debris[team].values()))
+        return self.__cached_snapshots("debris", team, self.__gs.debris[team].values)
 
-    def sense_debris_within_radius_squared(self, team: Team, x: int, y: int, r2: int) -> List[Debris]:
-        inRange: List[Debris] = []
-        for deb in self.__gs.debris[team].values():
-            if (deb.x - x)**2 + (deb.y - y)**2 <= r2:
-                inRange.append(copy.deepcopy(deb))
+    def get_debris_occupancy(self, team: Team) -> np.ndarray:
+        '''
+        Returns an array over path indices (positions in get_map().path) holding the number of the team's debris on each
+        '''
+        return self.__gs.debris[team].path_occupancy().copy()
 
-        return inRange
+    def __cached_snapshots(self, kind: str, team: Team, build) -> list:
+        # Snapshots are immutable, so they can be shared between calls until the game state changes
+        key = (kind, team)
+        version = (self.__gs.turn, self.__gs.generation)
+        cached = self.__snapshots.get(key)
+        if cached is None or cached[0] != version:
+            cached = (version, build())
+            self.__snapshots[key] = cached
+        return list(cached[1])
+
+    def sense_debris_within_radius_squared(self, team: Team, x: int, y: int, r2: int) -> List[Debris]:
+        store = self.__gs.debris[team]
+        return store.views(store.rows_in_path_range(self.__gs.map.path_mask_in_range(x, y, r2)))
 
     def sense_debris_in_range_of_tower(self, team: Team, tower_id: int) -> List[Debris]:
         if tower_id not in self.__gs.towers[team]:
@@ -45,15 +75,15 @@ class RobotController:
         tower = self.__gs.towers[team][tower_id]
         return self.sense_debris_within_radius_squared(team, tower.x, tower.y, tower.type.range)
 
-    def sense_towers_within_radius_squared(self, team: Team, x: int, y: int, r2: int) -> List[Tower]:
-        inRange: List[Tower] = []
+    def sense_towers_within_radius_squared(self, team: Team, x: int, y: int, r2: int) -> List[TowerSnapshot]:
+        inRange: List[TowerSnapshot] = []
         for tower in self.__gs.towers[team].values():
             if (tower.x - x)**2 + (tower.y - y)**2 <= r2:
-                inRange.append(copy.deepcopy(tower))
+                inRange.append(tower.snapshot())
 
         return inRange
 
-    def sense_towers_in_range_of_tower(self, team: Team, tower_id: int) -> List[Tower]:
+    def sense_towers_in_range_of_tower(self, team: Team, tower_id: int) -> List[TowerSnapshot]:
         if tower_id not in self.__gs.towers[team]:
             raise GameException(f"Tried to sense towers in range of non-existent tower: {tower_id}")
         tower = self.__gs.towers[team][tower_id]
@@ -106,6 +136,12 @@ class RobotController:
         if type(x) != int or type(y) != int:
             raise GameException("x and y must be integers (and can't be numpy.int64)")
         return self.__gs.is_placeable(team, x, y)
+
+    def placeable_mask(self, team: Team) -> np.ndarray:
+        '''
+        Returns a (width, height) boolean array that is True where is_placeable(team, x, y) would be
+        '''
+        return self.__gs.placeable_mask(team)
     
     def can_build_tower(self, tower_type: TowerType, x: int, y: int) -> bool:
         if self.__gs.balance[self.__team] < tower_type.cost:
@@ -117,8 +153,7 @@ class RobotController:
     def build_tower(self, tower_type: TowerType, x: int, y: int):
         if not self.can_build_tower(tower_type, x, y):
             raise GameException("build_tower() called but can_build_tower() returned False")
-        tower = Tower(self.__team, tower_type, x, y)
-        self.__gs.towers[self.__team][tower.id] = tower
+        self.__gs.build_tower(self.__team, tower_type, x, y)
         self.__gs.balance[self.__team] -= tower_type.cost
 
     def sell_tower(self, tower_id: int):
@@ -127,10 +162,22 @@ class RobotController:
             raise GameException("Cannot sell tower that doesn't exist")
         cost = my_towers[tower_id].type.cost
         self.__gs.balance[self.__team] += cost * GameConstants.REFUND_RATIO
-        del self.__gs.towers[self.__team][tower_id]
+        self.__gs.sell_tower(self.__team, tower_id)
     
     def get_time_remaining_at_start_of_turn(self, team: Team) -> float:
         return self.__gs.time_remaining[team]
+
+    def sleep_until(self, turn: int = None, balance: float = None, debris_in_range: bool = False, enemy_builds_or_sells: bool = False):
+        '''
+        Stops play_turn from being called on the following turns until one of the given conditions holds:
+        the turn number reaches turn, the ally balance reaches balance, debris is in range of one of
+        the ally gunships or bombers, or the enemy builds or sells a tower.
+        Towers do not attack on their own while the bot sleeps.
+        '''
+        if turn is None and balance is None and not debris_in_range and not enemy_builds_or_sells:
+            raise GameException("sleep_until() needs at least one condition to wake up on")
+        enemy_changes = self.__gs.tower_changes[self.get_enemy_team()] if enemy_builds_or_sells else None
+        self.__gs.wake_conditions[self.__team] = WakeCondition(turn, balance, debris_in_range, enemy_changes)
     
     def can_snipe(self, tower_id: int, debris_id: int) -> bool:
         my_towers = self.__gs.towers[self.__team]
@@ -168,7 +215,7 @@ class RobotController:
         tower = self.__gs.towers[self.__team][tower_id]
         debris = self.__gs.debris[self.__team][debris_id]
 
-        tower.current_cooldown = TowerType.GUNSHIP.cooldown
+        self.__gs.start_tower_cooldown(tower, TowerType.GUNSHIP.cooldown)
 
         self.__gs.current_snipes[self.__team].append(((tower.x, tower.y), (debris.x, debris.y)))
         self.__gs.damage_debris(debris_id, TowerType.GUNSHIP.damage)
@@ -179,30 +226,20 @@ class RobotController:
         tower = self.__gs.towers[self.__team][tower_id]
         if tower.type != TowerType.GUNSHIP:
             raise GameException("Auto sniping only works on Gunships")
+        self.__auto_snipe(tower, priority)
 
-        # Get list of snipeable debris
-        debris = []
-        for deb in self.__gs.debris[self.__team].values():
-            if self.can_snipe(tower_id, deb.id):
-                debris.append(deb)
-        
-        if len(debris) == 0:
+    def __auto_snipe(self, tower, priority: SnipePriority):
+        if tower.current_cooldown > 0:
             return
-        
-        if priority == SnipePriority.FIRST:
-            get_priority = lambda debris: debris.progress
-        elif priority == SnipePriority.LAST:
-            get_priority = lambda debris: -debris.progress
-        elif priority == SnipePriority.CLOSE:
-            get_priority = lambda debris: -(debris.x - tower.x)**2 - (debris.y - tower.y)**2
-        elif priority == SnipePriority.WEAK:
-            get_priority = lambda debris: -debris.total_health
-        elif priority == SnipePriority.STRONG:
-            get_priority = lambda debris: debris.total_health
-        else:
-            raise GameException("Invalid priority passed to auto_snipe")
-        highest_priority = max(debris, key=get_priority)
-        self.snipe(tower_id, highest_priority.id)
+        store = self.__gs.debris[self.__team]
+        highest_priority = store.best_in_range(tower.x, tower.y, TowerType.GUNSHIP.range, priority)
+        if highest_priority < 0:
+            return
+
+        # Same as snipe(), which would only repeat the checks made above
+        self.__gs.start_tower_cooldown(tower, TowerType.GUNSHIP.cooldown)
+        self.__gs.current_snipes[self.__team].append(((tower.x, tower.y), (int(store.x[highest_priority]), int(store.y[highest_priority]))))
+        self.__gs.damage_debris_rows(self.__team, [highest_priority], TowerType.GUNSHIP.damage)
     
     def can_bomb(self, tower_id: int):
         my_towers = self.__gs.towers[self.__team]
@@ -222,28 +259,56 @@ class RobotController:
             raise GameException("Cannot bomb")
         
         tower = self.__gs.towers[self.__team][tower_id]
-
-        tower.current_cooldown = TowerType.BOMBER.cooldown
-
-        self.__gs.current_bombs[self.__team].append((tower.x, tower.y))
-        ids_in_range = []
-        for deb in self.__gs.debris[self.__team].values():
-            distance = (tower.x - deb.x)**2 + (tower.y - deb.y)**2
-            if distance <= TowerType.BOMBER.range:
-                ids_in_range.append(deb.id)
-        for deb_id in ids_in_range:
-            self.__gs.damage_debris(deb_id, TowerType.BOMBER.damage)
+        self.__detonate(tower, self.__rows_in_bomb_range(tower))
     
     def auto_bomb(self, tower_id: int):
         if tower_id not in self.__gs.towers[self.__team]:
             raise GameException("Invalid tower id")
         tower = self.__gs.towers[self.__team][tower_id]
+        if tower.type != TowerType.BOMBER:
+            raise GameException("Tower is not a bomber")
+        self.__auto_bomb(tower)
 
-        if not self.can_bomb(tower_id):
+    def __auto_bomb(self, tower):
+        if tower.current_cooldown > 0:
             return
         
-        nearby_debris = self.sense_debris_in_range_of_tower(self.__team, tower_id)
-        if len(nearby_debris) == 0:
+        store = self.__gs.debris[self.__team]
+        if not store.any_in_path_indices(self.__gs.map.path_indices_in_range(tower.x, tower.y, TowerType.BOMBER.range)):
             return
-        
-        self.bomb(tower_id)
+        self.__detonate(tower, self.__rows_in_bomb_range(tower))
+
+    def __rows_in_bomb_range(self, tower) -> np.ndarray:
+        store = self.__gs.debris[self.__team]
+        return store.rows_in_path_range(self.__gs.map.path_mask_in_range(tower.x, tower.y, TowerType.BOMBER.range))
+
+    def __detonate(self, tower, rows_in_range: np.ndarray):
+        # All debris in range are damaged at once, then the ones left with no health are removed
+        self.__gs.start_tower_cooldown(tower, TowerType.BOMBER.cooldown)
+        self.__gs.current_bombs[self.__team].append((tower.x, tower.y))
+        self.__gs.damage_debris_rows(self.__team, rows_in_range, TowerType.BOMBER.damage)
+
+    def auto_attack(self, tower_id: int, priority: SnipePriority = SnipePriority.FIRST):
+        '''
+        Calls auto_snipe(tower_id, priority) if the tower is a gunship, or auto_bomb(tower_id) if it is a bomber.
+        Other towers don't attack, so nothing happens for them.
+        '''
+        if tower_id not in self.__gs.towers[self.__team]:
+            raise GameException("auto_attack(): Invalid tower id")
+        self.__auto_attack(self.__gs.towers[self.__team][tower_id], priority)
+
+    def auto_attack_all(self, priority: SnipePriority = SnipePriority.FIRST):
+        '''
+        Calls auto_attack(tower.id, priority) for every ally tower, in order of tower id.
+        Gives the same result as looping over get_towers(), but without the snapshots and repeated checks.
+        '''
+        # Only gunships and bombers whose cooldown is over can attack
+        ready = self.__gs.ready_attackers[self.__team]
+        for tower in [ready[tower_id] for tower_id in sorted(ready)]:
+            self.__auto_attack(tower, priority)
+
+    def __auto_attack(self, tower, priority: SnipePriority):
+        if tower.type == TowerType.GUNSHIP:
+            self.__auto_snipe(tower, priority)
+        elif tower.type == TowerType.BOMBER:
+            self.__auto_bomb(tower)
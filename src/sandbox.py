@@ -0,0 +1,351 @@
+# Runs a bot in its own process, so a bot that overruns its time pool can be stopped
+# instead of being left running in a thread next to the game.
+#
+# The game state is mirrored into shared memory, where the bot process reads it through a
+# local GameState. Everything the bot does that changes the game is sent back over a pipe
+# as a small (command, args, kwargs) message and carried out by the real RobotController.
+
+import multiprocessing
+import time
+import traceback
+from multiprocessing import shared_memory
+import numpy as np
+
+from src.debris import DebrisStore
+from src.game_constants import Team, TowerType
+from src.game_state import GameState
+from src.map import Map
+from src.precompute import Precompute, overrides_precompute
+from src.robot_controller import RobotController
+from src.tower import Tower
+
+# RobotController methods that change the game, which the bot process forwards to the game
+COMMANDS = [
+    "send_debris", "build_tower", "sell_tower", "snipe", "auto_snipe", "bomb", "auto_bomb",
+    "auto_attack", "auto_attack_all", "sleep_until"
+]
+
+TOWER_TYPES = list(TowerType)
+TOWER_COLUMNS = ["id", "type", "x", "y", "current_cooldown", "integral_cooldown"]
+DEBRIS_CAPACITY = 1024
+
+# Header layout: a few game-wide values, then the same block of values for each team.
+# Numbers that may be int or float are stored next to a flag saying which they were.
+GENERATION, TURN, CAPACITY = 0, 1, 2
+TEAM_VALUES = [
+    "towers", "debris",
+    "balance", "integral_balance", "health", "integral_health", "time_remaining", "integral_time_remaining",
+    "has_sent", "sent_cooldown", "sent_health"
+]
+HEADER_SIZE = 3 + len(Team) * len(TEAM_VALUES)
+
+def header_index(team: Team, value: str) -> int:
+    return 3 + team.value * len(TEAM_VALUES) + TEAM_VALUES.index(value)
+
+def typed(value: float, integral: float):
+    return int(value) if integral else float(value)
+
+class StateMirror:
+    '''
+    Shared memory copy of the parts of a GameState that bots can read
+    '''
+    def __init__(self, shm: shared_memory.SharedMemory, map: Map, capacity: int):
+        self.shm = shm
+        self.name = shm.name
+        self.tower_capacity = map.width * map.height
+        self.debris_capacity = capacity
+
+        offset = 0
+        def block(shape):
+            nonlocal offset
+            array = np.ndarray(shape, dtype=np.float64, buffer=shm.buf, offset=offset)
+            offset += array.nbytes
+            return array
+        self.header = block((HEADER_SIZE,))
+        self.towers = block((len(Team), len(TOWER_COLUMNS), self.tower_capacity))
+        self.debris = block((len(Team), len(DebrisStore.COLUMNS), self.debris_capacity))
+        self.published_generation = -1
+
+    @staticmethod
+    def size(map: Map, capacity: int) -> int:
+        return 8 * (HEADER_SIZE + len(Team) * (len(TOWER_COLUMNS) * map.width * map.height + len(DebrisStore.COLUMNS) * capacity))
+
+    @staticmethod
+    def create(map: Map, capacity: int = DEBRIS_CAPACITY) -> "StateMirror":
+        mirror = StateMirror(shared_memory.SharedMemory(create=True, size=StateMirror.size(map, capacity)), map, capacity)
+        mirror.header[CAPACITY] = capacity
+        return mirror
+
+    @staticmethod
+    def attach(name: str, map: Map) -> "StateMirror":
+        shm = shared_memory.SharedMemory(name=name)
+        capacity = int(np.ndarray((HEADER_SIZE,), dtype=np.float64, buffer=shm.buf)[CAPACITY])
+        return StateMirror(shm, map, capacity)
+
+    def close(self, unlink: bool = False):
+        # The arrays must be dropped before the buffer they point into can be released
+        del self.header, self.towers, self.debris
+        self.shm.close()
+        if unlink:
+            self.shm.unlink()
+
+    def publish(self, gs: GameState) -> "StateMirror":
+        '''
+        Writes gs into shared memory. If the debris no longer fit, the state is written into a new,
+        larger mirror which is returned in place of this one.
+        '''
+        needed = max(len(gs.debris[team]) for team in Team)
+        if needed > self.debris_capacity:
+            mirror = StateMirror.create(gs.map, max(needed, 2 * self.debris_capacity))
+            self.close(unlink=True)
+            return mirror.publish(gs)
+
+        header = self.header
+        header[TURN] = gs.turn
+        for team in Team:
+            header[header_index(team, "balance")] = gs.balance[team]
+            header[header_index(team, "integral_balance")] = isinstance(gs.balance[team], int)
+            header[header_index(team, "health")] = gs.health[team]
+            header[header_index(team, "integral_health")] = isinstance(gs.health[team], int)
+            header[header_index(team, "time_remaining")] = gs.time_remaining[team]
+            header[header_index(team, "integral_time_remaining")] = isinstance(gs.time_remaining[team], int)
+            sent = gs.sent_debris[team]
+            header[header_index(team, "has_sent")] = sent is not None
+            if sent is not None:
+                header[header_index(team, "sent_cooldown")], header[header_index(team, "sent_health")] = sent
+
+        if gs.generation != self.published_generation:
+            for team in Team:
+                towers = self.towers[team.value]
+                for (i, tower) in enumerate(gs.towers[team].values()):
+                    towers[:, i] = (
+                        tower.id, TOWER_TYPES.index(tower.type), tower.x, tower.y,
+                        tower.current_cooldown, isinstance(tower.current_cooldown, int)
+                    )
+                header[header_index(team, "towers")] = len(gs.towers[team])
+                gs.debris[team].export(self.debris[team.value])
+                header[header_index(team, "debris")] = len(gs.debris[team])
+            header[GENERATION] = gs.generation
+            self.published_generation = gs.generation
+        return self
+
+    def load(self, gs: GameState):
+        '''
+        Copies the mirrored state into gs, a GameState private to the bot process
+        '''
+        header = self.header
+        gs.turn = int(header[TURN])
+        for team in Team:
+            gs.balance[team] = typed(header[header_index(team, "balance")], header[header_index(team, "integral_balance")])
+            gs.health[team] = typed(header[header_index(team, "health")], header[header_index(team, "integral_health")])
+            gs.time_remaining[team] = typed(header[header_index(team, "time_remaining")], header[header_index(team, "integral_time_remaining")])
+            gs.sent_debris[team] = None
+            if header[header_index(team, "has_sent")]:
+                gs.sent_debris[team] = (int(header[header_index(team, "sent_cooldown")]), int(header[header_index(team, "sent_health")]))
+
+        generation = int(header[GENERATION])
+        if generation == self.published_generation:
+            return
+        for team in Team:
+            gs.clear_towers(team)
+            num_towers = int(header[header_index(team, "towers")])
+            for (id, type, x, y, cooldown, integral) in self.towers[team.value][:, :num_towers].T.tolist():
+                tower = Tower(team, TOWER_TYPES[int(type)], int(x), int(y), id=int(id))
+                tower.current_cooldown = typed(cooldown, integral)
+                gs.add_tower(tower)
+            gs.debris[team].load(self.debris[team.value], int(header[header_index(team, "debris")]))
+        gs.generation = generation
+        self.published_generation = generation
+
+class SandboxController(RobotController):
+    '''
+    RobotController handed to a bot running in a sandbox process.
+    Reads are answered from a local copy of the game state, commands are carried out by the game.
+    '''
+    def __init__(self, team: Team, map: Map, conn, bot_path: str):
+        self.__gs = GameState(map)
+        super().__init__(team, self.__gs, bot_path)
+        self.__conn = conn
+        self.__mirror = None
+        self.__stale = True
+
+    def start_turn(self, mirror_name: str):
+        self.attach(mirror_name)
+        self.__stale = True
+
+    def attach(self, mirror_name: str):
+        if self.__mirror is not None and self.__mirror.name == mirror_name:
+            return
+        if self.__mirror is not None:
+            self.__mirror.close()
+        self.__mirror = StateMirror.attach(mirror_name, self.__gs.map)
+
+    def sync(self):
+        if not self.__stale:
+            return
+        self.__conn.send(("sync",))
+        self.attach(self.__conn.recv())
+        self.__mirror.load(self.__gs)
+        self.__stale = False
+
+    def send_command(self, name: str, args: tuple, kwargs: dict):
+        self.__conn.send((COMMANDS.index(name), args, kwargs))
+        status, result = self.__conn.recv()
+        self.__stale = True
+        if status == "error":
+            raise result
+        return result
+
+def synced_read(method):
+    def read(self, *args, **kwargs):
+        self.sync()
+        return method(self, *args, **kwargs)
+    return read
+
+def forwarded_command(name: str):
+    def command(self, *args, **kwargs):
+        return self.send_command(name, args, kwargs)
+    return command
+
+for (name, method) in list(vars(RobotController).items()):
+    if name.startswith("_") or not callable(method):
+        continue
+    setattr(SandboxController, name, forwarded_command(name) if name in COMMANDS else synced_read(method))
+
+def run_bot(bot_path: str, team: Team, map: Map, conn):
+    '''
+    Entry point of the sandbox process
+    '''
+    from src.game import import_file
+
+    try:
+        bot_name = bot_path.replace("\\", "/").split("/")[-1].split(".")[0]
+        player = import_file(bot_name, bot_path).BotPlayer(map)
+    except:
+        traceback.print_exc()
+        conn.send(("failed",))
+        return
+    conn.send(("ready",))
+
+    controller = SandboxController(team, map, conn, bot_path)
+    while True:
+        message = conn.recv()
+        if message[0] == "close":
+            return
+        if message[0] == "precompute":
+            if overrides_precompute(player):
+                Precompute(player, map).finish(time.perf_counter() + message[1])
+            conn.send(("precomputed",))
+            continue
+        controller.start_turn(message[1])
+        try:
+            player.play_turn(controller)
+        except SystemExit:
+            pass
+        except Exception:
+            traceback.print_exc()
+        conn.send(("done",))
+
+class SandboxedPlayer:
+    '''
+    Game-side handle on a bot running in a sandbox process. Used in place of a PlayerWorker.
+    '''
+    def __init__(self, bot_path: str, team: Team, gs: GameState):
+        self.gs = gs
+        self.mirror = StateMirror.create(gs.map)
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.Process(target=run_bot, args=(bot_path, team, gs.map, child_conn), daemon=True)
+        self.process.start()
+        child_conn.close()
+        # Set once the bot process has died or been killed, after which every turn fails
+        self.dead = False
+
+        try:
+            ready = self.conn.recv()[0] == "ready"
+        except EOFError:
+            ready = False
+        if not ready:
+            self.close()
+            raise Exception(f"Failed to initialize {bot_path} in a sandbox")
+
+    def start_precompute(self, budget: float):
+        try:
+            self.conn.send(("precompute", budget))
+        except (BrokenPipeError, OSError):
+            self.dead = True
+
+    def finish_precompute(self, deadline: float) -> bool:
+        '''
+        Waits for the sandbox to finish precomputing. It gives up on precompute itself at deadline,
+        so the process is only killed if it still hasn't answered a second later.
+        '''
+        if self.dead:
+            return False
+        remaining = deadline + 1 - time.perf_counter()
+        try:
+            if remaining > 0 and self.conn.poll(remaining):
+                return self.conn.recv()[0] == "precomputed"
+        except EOFError:
+            self.dead = True
+            return False
+        self.process.kill()
+        self.dead = True
+        return False
+
+    def call(self, controller: RobotController, timeout: float) -> bool:
+        '''
+        Plays one turn in the sandbox, carrying out the bot's commands on controller.
+        Returns False, after killing the process, if the turn did not finish within timeout seconds.
+        Once the process has died, every turn returns False.
+        '''
+        if self.dead:
+            return False
+        deadline = time.perf_counter() + timeout
+        self.mirror = self.mirror.publish(self.gs)
+        try:
+            self.conn.send(("turn", self.mirror.name))
+        except (BrokenPipeError, OSError):
+            self.dead = True
+            return False
+        while True:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0 or not self.conn.poll(remaining):
+                    self.process.kill()
+                    self.dead = True
+                    return False
+                message = self.conn.recv()
+            except EOFError:
+                # The bot process died
+                self.dead = True
+                return False
+
+            if message[0] == "done":
+                return True
+            if message[0] == "sync":
+                self.mirror = self.mirror.publish(self.gs)
+                reply = self.mirror.name
+            else:
+                opcode, args, kwargs = message
+                try:
+                    reply = ("ok", getattr(controller, COMMANDS[opcode])(*args, **kwargs))
+                except Exception as e:
+                    reply = ("error", e)
+            try:
+                self.conn.send(reply)
+            except (BrokenPipeError, OSError):
+                self.dead = True
+                return False
+
+    def close(self):
+        if self.process.is_alive():
+            try:
+                self.conn.send(("close",))
+            except (BrokenPipeError, OSError):
+                pass
+            self.process.join(1)
+        if self.process.is_alive():
+            self.process.kill()
+        self.process.join()
+        self.conn.close()
+        self.mirror.close(unlink=True)
@@ -1,19 +1,58 @@
+from dataclasses import dataclass
 from src.game_constants import Team, TowerType
 
+class CooldownClock:
+    '''
+    Number of times a game has counted down its tower cooldowns, shared by all of its towers
+    '''
+    def __init__(self):
+        self.tick = 0
+
 class Tower:
     id_counter = 0
 
-    def __init__(self, team: Team, type: TowerType, x: int, y: int):
-        self.id = self.increment()
+    def __init__(self, team: Team, type: TowerType, x: int, y: int, id: int = None):
+        self.id = self.increment() if id is None else id
         self.team = team
         self.type = type
         self.x = x
         self.y = y
-        self.current_cooldown = 1.0
+        # The cooldown takes the values in cooldown_steps on successive ticks of clock, starting at
+        # tick cooldown_since and staying at the last one. GameState fills these in, see GameState.start_tower_cooldown.
+        self.clock = None
+        self.cooldown_steps = (1.0,)
+        self.cooldown_since = 0
+
+    @property
+    def current_cooldown(self) -> float:
+        steps = self.cooldown_steps
+        if self.clock is None:
+            return steps[0]
+        return steps[min(self.clock.tick - self.cooldown_since, len(steps) - 1)]
+
+    @current_cooldown.setter
+    def current_cooldown(self, cooldown: float):
+        # Fixes the cooldown at the given value, for towers outside of a game
+        self.cooldown_steps = (cooldown,)
+        self.cooldown_since = 0 if self.clock is None else self.clock.tick
     
     @staticmethod
     def increment() -> int:
         res = Tower.id_counter
         Tower.id_counter += 1
         return res
-    
\ No newline at end of file
+
+    def snapshot(self) -> "TowerSnapshot":
+        return TowerSnapshot(self.id, self.team, self.type, self.x, self.y, self.current_cooldown)
+
+@dataclass(frozen=True, slots=True)
+class TowerSnapshot:
+    '''
+    Read-only copy of a tower, as handed out to bots
+    '''
+    id: int
+    team: Team
+    type: TowerType
+    x: int
+    y: int
+    current_cooldown: float